@@ -0,0 +1,78 @@
+"""Throughput of the shared embedding service vs. micro-batch window.
+
+Starts the service in-process for each window, then fires single-text encode
+requests from many client threads (like concurrent search/ingest calls):
+
+    python bench_embedding_service.py --clients 32 --requests 50
+"""
+import argparse
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from sentence_transformers import SentenceTransformer
+from embedding_service import serve, RemoteEmbedder, EMBEDDING_MODEL_NAME, MicroBatcher
+
+SENTENCE = "How does the knowledge graph link related notes together in MeshMemory?"
+
+
+def run_clients(encode, clients: int, requests: int):
+    """Returns (texts/sec, p50 ms, p95 ms) for `clients` threads doing `requests` calls each."""
+    latencies = []
+
+    def worker(i):
+        own = []
+        for j in range(requests):
+            start = time.perf_counter()
+            encode(f"{SENTENCE} ({i}-{j})")
+            own.append((time.perf_counter() - start) * 1000)
+        return own
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(clients) as pool:
+        for own in pool.map(worker, range(clients)):
+            latencies.extend(own)
+    elapsed = time.perf_counter() - start
+    return clients * requests / elapsed, np.percentile(latencies, 50), np.percentile(latencies, 95)
+
+
+def start_service(encode_fn, addr: str, max_batch: int, window_ms: float) -> MicroBatcher:
+    """Runs the service on a background event loop and returns its batcher for stats."""
+    ready = threading.Event()
+    # MicroBatcher owns an asyncio.Queue, so create it inside the service's loop
+    holder = {}
+
+    async def main():
+        holder["batcher"] = MicroBatcher(encode_fn, max_batch, window_ms)
+        await serve(holder["batcher"], addr, ready)
+
+    threading.Thread(target=lambda: asyncio.run(main()), daemon=True).start()
+    ready.wait()
+    return holder["batcher"]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--max-batch", type=int, default=64)
+    parser.add_argument("--windows", default="0,1,2,5,10,20", help="Comma-separated max wait values in ms")
+    args = parser.parse_args()
+
+    model = SentenceTransformer(EMBEDDING_MODEL_NAME)
+    encode_fn = lambda texts: model.encode(texts, batch_size=args.max_batch, convert_to_numpy=True)
+    model.encode(SENTENCE) # Warm-up
+
+    print(f"{args.clients} clients x {args.requests} single-text requests\n")
+    print(f"{'mode':<18} {'texts/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'avg batch':>10}")
+    tps, p50, p95 = run_clients(model.encode, args.clients, args.requests)
+    print(f"{'in-process':<18} {tps:>9.0f} {p50:>8.1f} {p95:>8.1f} {'1':>10}")
+
+    for port, window in enumerate(float(w) for w in args.windows.split(",")):
+        addr = f"127.0.0.1:{8900 + port}"
+        batcher = start_service(encode_fn, addr, args.max_batch, window)
+        client = RemoteEmbedder(addr)
+        tps, p50, p95 = run_clients(client.encode, args.clients, args.requests)
+        avg_batch = batcher.texts / max(batcher.batches, 1)
+        print(f"{f'service {window:g}ms':<18} {tps:>9.0f} {p50:>8.1f} {p95:>8.1f} {avg_batch:>10.1f}")
@@ -0,0 +1,130 @@
+"""Recall / latency / memory report for vector index configurations on your own corpus.
+
+Copies the vectors of WEAVIATE_COLLECTION into throwaway Bench_* collections,
+one per configuration, and queries each with perturbed copies of corpus vectors:
+
+    python bench_index_configs.py --queries 200 --k 10
+
+The "current" row is the configuration ensure_schema builds from .env
+(vector_index_config()); "default" is Weaviate's built-in HNSW defaults.
+
+Recall@k is measured against exact (brute-force) cosine search. "est. MB" is not
+measured: it is a formula estimate of the vector index's in-RAM size (compressed
+vectors + HNSW links); with quantization the float32 originals stay on disk for
+rescoring.
+"""
+import argparse
+import time
+import numpy as np
+from weaviate.classes.config import Configure, VectorDistances
+from core_logic import (client, CLASS_NAME, iter_notes, _extract_vector, vector_index_config,
+                        HNSW_MAX_CONNECTIONS, VECTOR_QUANTIZER, PQ_SEGMENTS)
+
+Quantizer = Configure.VectorIndex.Quantizer
+
+# Estimated bytes per vector in memory as a function of dim, per VECTOR_QUANTIZER
+QUANTIZED_BYTES = {
+    "none": lambda d: d * 4,
+    "sq": lambda d: d,
+    "bq": lambda d: d / 8,
+    "pq": lambda d: PQ_SEGMENTS,
+}
+
+# name -> (hnsw kwargs, quantizer, bytes per vector in memory as a function of dim)
+CONFIGS = {
+    "current":  (None, None, QUANTIZED_BYTES.get(VECTOR_QUANTIZER, QUANTIZED_BYTES["none"])),
+    "default":  ({}, None, lambda d: d * 4),
+    "ef64":     ({"ef": 64}, None, lambda d: d * 4),
+    "ef256":    ({"ef": 256}, None, lambda d: d * 4),
+    "m16":      ({"max_connections": 16}, None, lambda d: d * 4),
+    "m64_efc256": ({"max_connections": 64, "ef_construction": 256}, None, lambda d: d * 4),
+    "sq":       ({}, lambda: Quantizer.sq(rescore_limit=200, training_limit=10000), lambda d: d),
+    "bq":       ({}, lambda: Quantizer.bq(rescore_limit=200), lambda d: d / 8),
+    "pq96":     ({}, lambda: Quantizer.pq(segments=96, training_limit=10000), lambda d: 96),
+}
+DEFAULT_MAX_CONNECTIONS = 32
+
+
+def load_corpus():
+    ids, vectors = [], []
+    for obj in iter_notes(include_vector=True, return_properties=[]):
+        ids.append(obj.uuid)
+        vectors.append(_extract_vector(obj.vector))
+    matrix = np.asarray(vectors, dtype=np.float32)
+    return ids, matrix / (np.linalg.norm(matrix, axis=1, keepdims=True) + 1e-9)
+
+
+def make_queries(corpus: np.ndarray, n: int, noise: float = 0.05, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    picks = corpus[rng.choice(len(corpus), size=min(n, len(corpus)), replace=False)]
+    queries = picks + noise * rng.normal(size=picks.shape).astype(np.float32)
+    return queries / np.linalg.norm(queries, axis=1, keepdims=True)
+
+
+def run_config(name, hnsw_kwargs, quantizer, ids, corpus, queries, truth, k):
+    collection_name = f"Bench_{name}"
+    if collection_name in client.collections.list_all():
+        client.collections.delete(collection_name)
+    collection = client.collections.create(
+        name=collection_name,
+        vectorizer_config=Configure.Vectorizer.none(),
+        # hnsw_kwargs=None means the deployed configuration from .env
+        vector_index_config=vector_index_config() if hnsw_kwargs is None else Configure.VectorIndex.hnsw(
+            distance_metric=VectorDistances.COSINE,
+            quantizer=quantizer() if quantizer else None,
+            **hnsw_kwargs
+        )
+    )
+    try:
+        start = time.perf_counter()
+        with collection.batch.dynamic() as batch:
+            for uid, vec in zip(ids, corpus):
+                batch.add_object(properties={}, vector=vec.tolist(), uuid=uid)
+        import_s = time.perf_counter() - start
+
+        latencies, hits = [], 0
+        for query, expected in zip(queries, truth):
+            start = time.perf_counter()
+            response = collection.query.near_vector(near_vector=query.tolist(), limit=k)
+            latencies.append((time.perf_counter() - start) * 1000)
+            hits += len({str(o.uuid) for o in response.objects} & expected)
+        return {
+            "recall": hits / (len(queries) * k),
+            "p50": float(np.percentile(latencies, 50)),
+            "p95": float(np.percentile(latencies, 95)),
+            "import_s": import_s,
+        }
+    finally:
+        client.collections.delete(collection_name)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--configs", default=",".join(CONFIGS), help="Comma-separated subset of: " + ", ".join(CONFIGS))
+    args = parser.parse_args()
+
+    try:
+        ids, corpus = load_corpus()
+        if len(ids) < args.k:
+            raise SystemExit(f"{CLASS_NAME} has only {len(ids)} notes; need at least k={args.k}.")
+        dim = corpus.shape[1]
+        queries = make_queries(corpus, args.queries)
+        top = np.argsort(-(queries @ corpus.T), axis=1)[:, :args.k]
+        truth = [{str(ids[i]) for i in row} for row in top]
+        print(f"Corpus: {len(ids)} notes x {dim} dims from {CLASS_NAME}; {len(queries)} queries, k={args.k}")
+        print("Note: PQ/SQ only compress once training_limit objects exist; smaller corpora stay uncompressed.")
+        print("est. MB is a formula estimate of the index's in-RAM size, not a measurement.\n")
+
+        print(f"{'config':<12} {'recall@k':>9} {'p50 ms':>8} {'p95 ms':>8} {'import s':>9} {'est. MB':>8}")
+        for name in args.configs.split(","):
+            hnsw_kwargs, quantizer, vector_bytes = CONFIGS[name]
+            result = run_config(name, hnsw_kwargs, quantizer, ids, corpus, queries, truth, args.k)
+            max_connections = HNSW_MAX_CONNECTIONS if hnsw_kwargs is None else hnsw_kwargs.get("max_connections", DEFAULT_MAX_CONNECTIONS)
+            links = max_connections * 2 * 8
+            memory_mb = len(ids) * (vector_bytes(dim) + links) / 1e6
+            print(f"{name:<12} {result['recall']:>9.3f} {result['p50']:>8.2f} {result['p95']:>8.2f} "
+                  f"{result['import_s']:>9.1f} {memory_mb:>8.1f}")
+    finally:
+        client.close()
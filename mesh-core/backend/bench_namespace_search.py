@@ -0,0 +1,91 @@
+"""Search latency as the total corpus grows while each namespace stays the same size.
+
+Compares one shared collection (unfiltered, and filtered by a namespace property)
+with one tenant per namespace. Uses random vectors, so no model is needed:
+
+    python bench_namespace_search.py --per-namespace 1000 --steps 1,10,50
+"""
+import argparse
+import time
+import numpy as np
+from weaviate.classes.config import Configure, Property, DataType, VectorDistances
+from weaviate.classes.query import Filter
+from weaviate.classes.tenants import Tenant
+from core_logic import client
+
+DIM = 384
+FLAT_NAME = "Bench_Flat"
+TENANT_NAME = "Bench_Tenants"
+
+
+def random_vectors(n: int, rng) -> np.ndarray:
+    vectors = rng.normal(size=(n, DIM)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def latency(run, queries) -> tuple:
+    times = []
+    for query in queries:
+        start = time.perf_counter()
+        run(query.tolist())
+        times.append((time.perf_counter() - start) * 1000)
+    return float(np.percentile(times, 50)), float(np.percentile(times, 95))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--per-namespace", type=int, default=1000)
+    parser.add_argument("--steps", default="1,10,50", help="Namespace counts to measure at")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    queries = random_vectors(args.queries, rng)
+    hnsw = Configure.VectorIndex.hnsw(distance_metric=VectorDistances.COSINE)
+
+    for name in (FLAT_NAME, TENANT_NAME):
+        if name in client.collections.list_all():
+            client.collections.delete(name)
+    flat = client.collections.create(
+        name=FLAT_NAME,
+        properties=[Property(name="namespace", data_type=DataType.TEXT, index_searchable=False)],
+        vectorizer_config=Configure.Vectorizer.none(),
+        vector_index_config=hnsw
+    )
+    tenants = client.collections.create(
+        name=TENANT_NAME,
+        vectorizer_config=Configure.Vectorizer.none(),
+        vector_index_config=hnsw,
+        multi_tenancy_config=Configure.multi_tenancy(enabled=True)
+    )
+
+    try:
+        print(f"{args.per_namespace} notes per namespace, {args.queries} queries, k={args.k} (p50 / p95 ms)\n")
+        print(f"{'namespaces':>10} {'total':>8} {'shared':>15} {'shared+filter':>15} {'tenant':>15}")
+        loaded = 0
+        for step in [int(n) for n in args.steps.split(",")]:
+            # Grow the corpus: add namespaces until there are `step` of them
+            for i in range(loaded, step):
+                namespace = f"ns{i}"
+                vectors = random_vectors(args.per_namespace, rng)
+                tenants.tenants.create([Tenant(name=namespace)])
+                with flat.batch.dynamic() as batch:
+                    for vec in vectors:
+                        batch.add_object(properties={"namespace": namespace}, vector=vec.tolist())
+                with tenants.with_tenant(namespace).batch.dynamic() as batch:
+                    for vec in vectors:
+                        batch.add_object(properties={}, vector=vec.tolist())
+            loaded = max(loaded, step)
+
+            scoped = tenants.with_tenant("ns0")
+            shared = latency(lambda q: flat.query.near_vector(near_vector=q, limit=args.k), queries)
+            filtered = latency(lambda q: flat.query.near_vector(
+                near_vector=q, limit=args.k, filters=Filter.by_property("namespace").equal("ns0")), queries)
+            tenant = latency(lambda q: scoped.query.near_vector(near_vector=q, limit=args.k), queries)
+            fmt = lambda r: f"{r[0]:.2f} / {r[1]:.2f}"
+            print(f"{loaded:>10} {loaded * args.per_namespace:>8} {fmt(shared):>15} {fmt(filtered):>15} {fmt(tenant):>15}")
+    finally:
+        client.collections.delete(FLAT_NAME)
+        client.collections.delete(TENANT_NAME)
+        client.close()
@@ -0,0 +1,37 @@
+"""Measures /search payload size and serialization time, old vs. new response shape.
+
+Uses synthetic results (no Weaviate/model needed):
+    python bench_search_payload.py
+"""
+import json
+import timeit
+import numpy as np
+import orjson
+
+RESULTS = 5
+DIM = 384
+RUNS = 2000
+
+rng = np.random.default_rng(0)
+text = "Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * 18  # ~1KB note
+
+def make_results(include_vector: bool):
+    results = []
+    for i in range(RESULTS):
+        res = {"text": text, "source": "user", "title": f"Note {i}", "distance": 0.5, "id": f"{i:032x}"}
+        if include_vector:
+            res["vector"] = rng.normal(size=DIM).astype(np.float32).tolist()
+        results.append(res)
+    return {"results": results}
+
+def report(label: str, payload: dict, dumps):
+    size = len(dumps(payload))
+    ms = timeit.timeit(lambda: dumps(payload), number=RUNS) / RUNS * 1000
+    print(f"{label:<34} {size / 1024:8.1f} KB {ms:8.3f} ms")
+
+if __name__ == "__main__":
+    stdlib = lambda p: json.dumps(p).encode()
+    print(f"{RESULTS} hits, {DIM}-dim vectors, mean of {RUNS} runs")
+    report("before: vectors + json", make_results(True), stdlib)
+    report("vectors + orjson", make_results(True), orjson.dumps)
+    report("after: no vectors + orjson", make_results(False), orjson.dumps)
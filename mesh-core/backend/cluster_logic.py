@@ -0,0 +1,187 @@
+import math
+import uuid
+import threading
+import numpy as np
+
+# --- Configuration ---
+MIN_CLUSTERS = 2
+MAX_CLUSTERS = 64
+KMEANS_BATCH_SIZE = 256
+KMEANS_ITERATIONS = 50
+# Rebuild from scratch once this fraction of the index changed incrementally
+REBUILD_CHANGE_RATIO = 0.25
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    """L2-normalizes rows so dot products are cosine similarities."""
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / (norms + 1e-9)
+
+
+def choose_k(n: int) -> int:
+    """Rule of thumb: sqrt(n/2) clusters, clamped to a range the UI can draw."""
+    return max(MIN_CLUSTERS, min(MAX_CLUSTERS, int(math.ceil(math.sqrt(n / 2)))))
+
+
+def minibatch_kmeans(vectors: np.ndarray, k: int, batch_size: int = KMEANS_BATCH_SIZE,
+                     iterations: int = KMEANS_ITERATIONS, seed: int = 42):
+    """Spherical mini-batch k-means (Sculley, 2010). Returns (centroids, counts)."""
+    rng = np.random.default_rng(seed)
+    n = len(vectors)
+    k = min(k, n)
+
+    # k-means++ style seeding on a sample keeps start-up cheap for big corpora
+    sample = vectors[rng.choice(n, size=min(n, batch_size * 4), replace=False)]
+    centroids = [sample[rng.integers(len(sample))]]
+    for _ in range(1, k):
+        dist = 1 - np.max(sample @ np.array(centroids).T, axis=1)
+        dist = np.clip(dist, 0, None) ** 2
+        probs = dist / dist.sum() if dist.sum() > 0 else None
+        centroids.append(sample[rng.choice(len(sample), p=probs)])
+    centroids = np.array(centroids, dtype=np.float32)
+    counts = np.zeros(k, dtype=np.int64)
+
+    for _ in range(iterations):
+        batch = vectors[rng.choice(n, size=min(n, batch_size), replace=False)]
+        nearest = np.argmax(batch @ centroids.T, axis=1)
+        for vec, c in zip(batch, nearest):
+            counts[c] += 1
+            eta = 1.0 / counts[c]
+            centroids[c] = (1 - eta) * centroids[c] + eta * vec
+        centroids = _normalize(centroids)
+
+    return centroids, counts
+
+
+class ClusterIndex:
+    """In-memory cluster assignments for note vectors, updated incrementally on writes."""
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.reset()
+
+    def reset(self):
+        self.centroids = None
+        self.epoch = None      # Changes on every rebuild; cluster ids are only valid within one epoch
+        self.vectors = {}      # note id -> normalized vector
+        self.names = {}        # note id -> display name
+        self.assignments = {}  # note id -> cluster id
+        self.counts = None     # cluster id -> number of members
+        self.changes = 0
+
+    @property
+    def size(self) -> int:
+        return len(self.assignments)
+
+    @property
+    def is_stale(self) -> bool:
+        return self.centroids is None or self.changes > max(10, REBUILD_CHANGE_RATIO * self.size)
+
+    def build(self, ids: list, vectors: list, names: list, k: int = None):
+        """Clusters the full set of vectors from scratch."""
+        with self.lock:
+            self.reset()
+            if not ids:
+                return
+            matrix = _normalize(np.asarray(vectors, dtype=np.float32))
+            self.centroids, _ = minibatch_kmeans(matrix, k or choose_k(len(ids)))
+            self.counts = np.zeros(len(self.centroids), dtype=np.int64)
+            # Random rather than a counter, so ids from another worker's index never look current
+            self.epoch = uuid.uuid4().hex[:12]
+            nearest = np.argmax(matrix @ self.centroids.T, axis=1)
+            for note_id, vec, name, c in zip(ids, matrix, names, nearest):
+                self.vectors[note_id] = vec
+                self.names[note_id] = name
+                self.assignments[note_id] = int(c)
+                self.counts[c] += 1
+            print(f"Clustered {len(ids)} notes into {len(self.centroids)} clusters.")
+
+    def assign(self, note_id: str, vector, name: str = ""):
+        """Adds (or re-assigns) one note and nudges its centroid towards it."""
+        with self.lock:
+            if self.centroids is None:
+                return
+            name = name or self.names.get(note_id, "")
+            self._discard(note_id)
+            vec = _normalize(np.asarray(vector, dtype=np.float32))
+            c = int(np.argmax(self.centroids @ vec))
+            self.counts[c] += 1
+            self.centroids[c] = _normalize(self.centroids[c] + (vec - self.centroids[c]) / self.counts[c])
+            self.vectors[note_id] = vec
+            self.names[note_id] = name
+            self.assignments[note_id] = c
+            self.changes += 1
+
+    def _discard(self, note_id: str) -> bool:
+        c = self.assignments.pop(note_id, None)
+        if c is None:
+            return False
+        self.counts[c] -= 1
+        self.vectors.pop(note_id, None)
+        self.names.pop(note_id, None)
+        return True
+
+    def remove(self, note_id: str):
+        with self.lock:
+            if self._discard(note_id):
+                self.changes += 1
+
+    def members(self, cluster_id: int) -> list:
+        with self.lock:
+            return [i for i, c in self.assignments.items() if c == cluster_id]
+
+    def label(self, cluster_id: int, members: list = None) -> str:
+        """Names a cluster after the member closest to its centroid."""
+        members = members if members is not None else self.members(cluster_id)
+        if not members:
+            return ""
+        sims = np.array([self.vectors[i] for i in members]) @ self.centroids[cluster_id]
+        return self.names.get(members[int(np.argmax(sims))], "")
+
+    def summary(self, threshold: float = 0.6):
+        """Aggregate view: one node per non-empty cluster, links between similar centroids."""
+        with self.lock:
+            if self.centroids is None:
+                return {"epoch": None, "nodes": [], "links": []}
+            nodes = []
+            active = []
+            for c in range(len(self.centroids)):
+                if not self.counts[c]:
+                    continue
+                members = self.members(c)
+                label = self.label(c, members)
+                preview = ", ".join(self.names.get(i, "") for i in members[:5])
+                nodes.append({
+                    "id": f"cluster:{c}",
+                    "name": f"{label} (+{len(members) - 1})" if len(members) > 1 else label,
+                    "fullText": f"Cluster of {len(members)} notes: {preview}",
+                    "source": "cluster",
+                    "val": len(members),
+                    "cluster": c,
+                    "epoch": self.epoch,
+                    "isCluster": True
+                })
+                active.append(c)
+
+            links = []
+            if len(active) > 1:
+                sim = self.centroids[active] @ self.centroids[active].T
+                for i, j in zip(*np.nonzero(np.triu(sim > threshold, k=1))):
+                    links.append({
+                        "source": f"cluster:{active[i]}",
+                        "target": f"cluster:{active[j]}",
+                        "value": float(sim[i, j])
+                    })
+            return {"epoch": self.epoch, "nodes": nodes, "links": links}
+
+    def member_links(self, members: list, threshold: float = 0.6) -> list:
+        """Semantic links between the notes of one cluster."""
+        with self.lock:
+            if len(members) < 2:
+                return []
+            matrix = np.array([self.vectors[i] for i in members])
+            sim = matrix @ matrix.T
+            return [
+                {"source": members[i], "target": members[j], "value": float(sim[i, j])}
+                for i, j in zip(*np.nonzero(np.triu(sim > threshold, k=1)))
+            ]
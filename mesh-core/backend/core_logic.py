@@ -1,13 +1,24 @@
 import weaviate
-from weaviate.classes.config import Property, DataType
+from weaviate.classes.config import Property, DataType, Configure, Reconfigure, VectorDistances
 from weaviate.classes.init import AdditionalConfig, Timeout, Auth
-from sentence_transformers import SentenceTransformer
+from weaviate.classes.query import Filter
+from weaviate.classes.data import DataObject
+from weaviate.classes.tenants import Tenant, TenantActivityStatus
 import ollama
 import uuid
 import os
+import json
+import base64
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pypdf import PdfReader
 import numpy as np
 from ingest_logic import ingest_url, ingest_youtube
+from cluster_logic import ClusterIndex
+from embedding_service import RemoteEmbedder, EMBEDDING_MODEL_NAME
+from media_cache import hash_file, get_cached, put_cached, save_job, load_job, prune_jobs
+from session_store import SessionStore, Session
 import google.generativeai as genai
 from groq import Groq
 from dotenv import load_dotenv
@@ -19,8 +30,46 @@ WEAVIATE_URL = os.getenv("WEAVIATE_URL", "localhost")
 WEAVIATE_PORT = int(os.getenv("WEAVIATE_PORT", 8080))
 WEAVIATE_API_KEY = os.getenv("WEAVIATE_API_KEY", "")
 OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "llama3")
-EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2"
-CLASS_NAME = "Note"
+# host:port or unix:/path of a shared embedding_service.py. Empty = load the model in-process.
+EMBEDDING_SERVICE_ADDR = os.getenv("EMBEDDING_SERVICE_ADDR", "")
+CLASS_NAME = os.getenv("WEAVIATE_COLLECTION", "Note")
+
+# --- Namespaces ---
+# With multi-tenancy every namespace is its own tenant (own shard, HNSW and BM25 index), so
+# search, graph and export only touch that slice. Fixed at collection creation: migrate
+# existing data with `python migrate_schema.py --to <name>`.
+MULTI_TENANCY = os.getenv("MULTI_TENANCY", "false").lower() == "true"
+DEFAULT_NAMESPACE = os.getenv("DEFAULT_NAMESPACE", "default")
+NAMESPACE_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+# "inactive" keeps idle tenants on local disk; "offloaded" moves them to cloud storage
+# (requires an offload module on the Weaviate server)
+TENANT_OFFLOAD_STATUS = os.getenv("TENANT_OFFLOAD_STATUS", "inactive").lower()
+# Offload namespaces idle for this long (seconds). 0 disables the background sweeper.
+TENANT_IDLE_OFFLOAD_SECONDS = int(os.getenv("TENANT_IDLE_OFFLOAD_SECONDS", 0))
+
+# --- Multimodal Ingestion ---
+GEMINI_MEDIA_MODEL = "gemini-2.5-flash" # 2.5 Flash for multimodal speed/cost
+# Audio/video, or any file above this size, is transcribed in a background job
+MEDIA_ASYNC_MIN_BYTES = int(os.getenv("MEDIA_ASYNC_MIN_BYTES", 5 * 1024 * 1024))
+# Give up on Gemini file processing after this long (seconds)
+GEMINI_PROCESSING_TIMEOUT = int(os.getenv("GEMINI_PROCESSING_TIMEOUT", 600))
+
+# --- Vector Index Configuration ---
+# ef=-1 lets Weaviate pick ef dynamically per query (dynamic_ef_* bounds)
+HNSW_EF = int(os.getenv("HNSW_EF", -1))
+HNSW_EF_CONSTRUCTION = int(os.getenv("HNSW_EF_CONSTRUCTION", 128))
+HNSW_MAX_CONNECTIONS = int(os.getenv("HNSW_MAX_CONNECTIONS", 32))
+# "none", "pq", "bq" or "sq". Compressed vectors live in memory, originals on disk for rescoring.
+VECTOR_QUANTIZER = os.getenv("VECTOR_QUANTIZER", "none").lower()
+QUANTIZER_RESCORE_LIMIT = int(os.getenv("QUANTIZER_RESCORE_LIMIT", 200))
+QUANTIZER_TRAINING_LIMIT = int(os.getenv("QUANTIZER_TRAINING_LIMIT", 100000))
+PQ_SEGMENTS = int(os.getenv("PQ_SEGMENTS", 96)) # must divide the vector dimension (384)
+# Text properties tokenized for BM25 (hybrid search). Others are stored but not indexed.
+BM25_PROPERTIES = [p.strip() for p in os.getenv("BM25_PROPERTIES", "text,title,source").split(",") if p.strip()]
+# Objects pulled per round-trip when walking the whole collection (export, graph)
+ITERATOR_BATCH_SIZE = int(os.getenv("ITERATOR_BATCH_SIZE", 200))
+# Above this many notes, /graph returns clusters instead of individual notes
+GRAPH_LOD_NODE_LIMIT = int(os.getenv("GRAPH_LOD_NODE_LIMIT", 300))
 
 # --- Singleton Initialization ---
 # We use a global client for simplicity in this script, 
@@ -72,27 +121,201 @@ def connect_to_weaviate(retries=5, delay=2):
 
 client = connect_to_weaviate()
 
-# Load embedding model once
-embedding_model = SentenceTransformer(EMBEDDING_MODEL_NAME)
+# Load embedding model once (or share one copy between all workers via the embedding service)
+if EMBEDDING_SERVICE_ADDR:
+    print(f"Using shared embedding service at {EMBEDDING_SERVICE_ADDR}")
+    embedding_model = RemoteEmbedder(EMBEDDING_SERVICE_ADDR)
+else:
+    from sentence_transformers import SentenceTransformer # Only needed when embedding in-process
+    embedding_model = SentenceTransformer(EMBEDDING_MODEL_NAME)
+
+def _quantizer_config(reconfigure: bool = False):
+    """Builds the quantizer settings for VECTOR_QUANTIZER (None when disabled)."""
+    quantizer = (Reconfigure if reconfigure else Configure).VectorIndex.Quantizer
+    if VECTOR_QUANTIZER == "pq":
+        return quantizer.pq(segments=PQ_SEGMENTS, training_limit=QUANTIZER_TRAINING_LIMIT)
+    if VECTOR_QUANTIZER == "bq":
+        return quantizer.bq(rescore_limit=QUANTIZER_RESCORE_LIMIT)
+    if VECTOR_QUANTIZER == "sq":
+        return quantizer.sq(rescore_limit=QUANTIZER_RESCORE_LIMIT, training_limit=QUANTIZER_TRAINING_LIMIT)
+    if VECTOR_QUANTIZER != "none":
+        raise ValueError(f"Unknown VECTOR_QUANTIZER '{VECTOR_QUANTIZER}' (expected none, pq, bq or sq).")
+    return None
+
+def vector_index_config():
+    """HNSW settings for new collections, from the HNSW_* / VECTOR_QUANTIZER env vars."""
+    return Configure.VectorIndex.hnsw(
+        distance_metric=VectorDistances.COSINE,
+        ef=HNSW_EF,
+        ef_construction=HNSW_EF_CONSTRUCTION,
+        max_connections=HNSW_MAX_CONNECTIONS,
+        quantizer=_quantizer_config()
+    )
 
-def ensure_schema():
+def note_properties():
+    """Note schema. Only BM25_PROPERTIES are tokenized for keyword search."""
+    return [
+        Property(name=name, data_type=DataType.TEXT,
+                 index_searchable=name in BM25_PROPERTIES,
+                 # "source" is kept filterable for exact-match lookups
+                 index_filterable=name == "source")
+        for name in ["text", "source", "title", "summary"]
+    ]
+
+def ensure_schema(name: str = CLASS_NAME):
     """Ensures the Weaviate schema exists."""
-    if CLASS_NAME not in client.collections.list_all():
+    if name not in client.collections.list_all():
         client.collections.create(
-            name=CLASS_NAME,
-            properties=[
-                Property(name="text", data_type=DataType.TEXT),
-                Property(name="source", data_type=DataType.TEXT), # e.g., "user", "web"
-                Property(name="title", data_type=DataType.TEXT),
-                Property(name="summary", data_type=DataType.TEXT),
-            ]
+            name=name,
+            properties=note_properties(),
+            vectorizer_config=Configure.Vectorizer.none(), # We embed client-side
+            vector_index_config=vector_index_config(),
+            multi_tenancy_config=Configure.multi_tenancy(
+                enabled=True,
+                auto_tenant_creation=True,
+                auto_tenant_activation=True # Cold tenants wake up on first access
+            ) if MULTI_TENANCY else None
+        )
+        print(f"Created collection: {name}")
+
+def apply_index_config(name: str = CLASS_NAME):
+    """Applies the mutable index settings (ef, quantization) to an existing collection.
+
+    efConstruction, maxConnections and property indexes are fixed at creation time;
+    changing those needs a copy into a new collection (see migrate_schema.py).
+    """
+    client.collections.get(name).config.update(
+        vector_index_config=Reconfigure.VectorIndex.hnsw(
+            ef=HNSW_EF,
+            quantizer=_quantizer_config(reconfigure=True)
+        )
+    )
+    print(f"Updated vector index config of {name} (ef={HNSW_EF}, quantizer={VECTOR_QUANTIZER}).")
+
+def check_schema(name: str = CLASS_NAME):
+    """Fails fast when the collection's multi-tenancy doesn't match MULTI_TENANCY.
+
+    Called by the servers at startup; migrate_schema.py imports this module without it,
+    since it is the tool that fixes the mismatch.
+    """
+    enabled = client.collections.get(name).config.get().multi_tenancy_config.enabled
+    if enabled != MULTI_TENANCY:
+        state = "is" if enabled else "is not"
+        raise RuntimeError(
+            f"Collection {name} {state} multi-tenant, but MULTI_TENANCY={str(MULTI_TENANCY).lower()}. "
+            f"Copy it into a collection with the current config (python migrate_schema.py --to <name>) "
+            f"and set WEAVIATE_COLLECTION=<name>, or change MULTI_TENANCY back."
         )
-        print(f"Created collection: {CLASS_NAME}")
 
 # Initialize schema on import (or call explicitly)
 ensure_schema()
 notes_collection = client.collections.get(CLASS_NAME)
 
+# Cluster assignments for the level-of-detail graph, per namespace (built lazily, kept in sync on writes)
+cluster_indexes = {}
+
+# --- Namespaces ---
+
+known_namespaces = set()
+namespace_last_used = {}
+
+def _check_namespace(namespace: str) -> str:
+    """Validates a namespace name and returns it (DEFAULT_NAMESPACE when empty)."""
+    namespace = namespace or DEFAULT_NAMESPACE
+    if not NAMESPACE_PATTERN.match(namespace):
+        raise ValueError(f"Invalid namespace '{namespace}' (letters, digits, '-' and '_', max 64).")
+    if not MULTI_TENANCY and namespace != DEFAULT_NAMESPACE:
+        raise ValueError("Namespaces require MULTI_TENANCY=true.")
+    return namespace
+
+def notes_for(namespace: str = DEFAULT_NAMESPACE, create: bool = False):
+    """Returns the Note collection scoped to a namespace (its tenant when multi-tenancy is on).
+
+    Returns None for a namespace that doesn't exist yet, unless `create` is set: only write
+    paths pass it (the tenant is then created by Weaviate's auto tenant creation on insert).
+    """
+    namespace = _check_namespace(namespace)
+    if not MULTI_TENANCY:
+        return notes_collection
+
+    # Another worker may have offloaded the tenant, and auto-activation doesn't cover
+    # OFFLOADED tenants, so with cloud offloading the status is checked on every access
+    if namespace not in known_namespaces or TENANT_OFFLOAD_STATUS == "offloaded":
+        tenant = notes_collection.tenants.get_by_name(namespace)
+        if tenant is None and not create:
+            return None
+        if tenant is not None:
+            if tenant.activity_status == TenantActivityStatus.OFFLOADED:
+                activate_namespace(namespace)
+            known_namespaces.add(namespace)
+    namespace_last_used[namespace] = time.monotonic()
+    return notes_collection.with_tenant(namespace)
+
+def clusters_for(namespace: str = DEFAULT_NAMESPACE) -> ClusterIndex:
+    """Cluster index of an existing namespace (callers go through notes_for first)."""
+    return cluster_indexes.setdefault(_check_namespace(namespace), ClusterIndex())
+
+def list_namespaces() -> list:
+    """Namespaces and their storage status (ACTIVE, INACTIVE, OFFLOADED...)."""
+    if not MULTI_TENANCY:
+        return [{"name": DEFAULT_NAMESPACE, "status": "ACTIVE"}]
+    return [
+        {"name": name, "status": tenant.activity_status.value}
+        for name, tenant in notes_collection.tenants.get().items()
+    ]
+
+def offload_namespace(namespace: str) -> bool:
+    """Moves an idle namespace out of memory (cold local disk or cloud storage)."""
+    if not MULTI_TENANCY:
+        return False
+    status = TenantActivityStatus.OFFLOADED if TENANT_OFFLOAD_STATUS == "offloaded" else TenantActivityStatus.INACTIVE
+    print(f"--- Offloading namespace {namespace} ({status.value}) ---")
+    try:
+        notes_collection.tenants.update([Tenant(name=namespace, activity_status=status)])
+        cluster_indexes.pop(namespace, None)
+        namespace_last_used.pop(namespace, None)
+        return True
+    except Exception as e:
+        print(f"!!! Error in offload_namespace: {e}")
+        return False
+
+def activate_namespace(namespace: str) -> bool:
+    """Brings an offloaded namespace back (inactive ones also reactivate on first access)."""
+    if not MULTI_TENANCY:
+        return False
+    try:
+        notes_collection.tenants.update([Tenant(name=namespace, activity_status=TenantActivityStatus.ACTIVE)])
+        return True
+    except Exception as e:
+        print(f"!!! Error in activate_namespace: {e}")
+        return False
+
+def offload_idle_namespaces(idle_seconds: int = TENANT_IDLE_OFFLOAD_SECONDS) -> list:
+    """Offloads namespaces this process hasn't touched for `idle_seconds`.
+
+    Other workers may still be using them; they reactivate the tenant on their next access
+    (see notes_for). Tenants that are already cold are left alone.
+    """
+    now = time.monotonic()
+    idle = [ns for ns, last in list(namespace_last_used.items()) if now - last > idle_seconds]
+    offloaded = []
+    for ns in idle:
+        tenant = notes_collection.tenants.get_by_name(ns)
+        if tenant is None or tenant.activity_status != TenantActivityStatus.ACTIVE:
+            namespace_last_used.pop(ns, None)
+            continue
+        if offload_namespace(ns):
+            offloaded.append(ns)
+    return offloaded
+
+def _offload_sweeper():
+    while True:
+        time.sleep(max(60, TENANT_IDLE_OFFLOAD_SECONDS // 4))
+        offload_idle_namespaces()
+
+if MULTI_TENANCY and TENANT_IDLE_OFFLOAD_SECONDS > 0:
+    threading.Thread(target=_offload_sweeper, daemon=True).start()
+
 # --- Core Functions ---
 
 def generate_summary(text: str) -> dict:
@@ -112,13 +335,12 @@ def generate_summary(text: str) -> dict:
             {'role': 'user', 'content': prompt},
         ], format='json')
         
-        import json
         return json.loads(response['message']['content'])
     except Exception as e:
         print(f"Summary generation failed: {e}")
         return {"title": text[:50] + "...", "summary": text[:100] + "..."}
 
-def add_note(text: str, source: str = "user", title: str = "") -> str:
+def add_note(text: str, source: str = "user", title: str = "", namespace: str = DEFAULT_NAMESPACE) -> str:
     """Ingests a note into the memory."""
     print(f"--- Ingesting Note (Source: {source}) ---")
     
@@ -133,41 +355,73 @@ def add_note(text: str, source: str = "user", title: str = "") -> str:
         vector = embedding_model.encode(text).tolist()
         print(f"Encoded text. Vector length: {len(vector)}")
         obj_uuid = uuid.uuid4()
-        notes_collection.data.insert(
+        notes_for(namespace, create=True).data.insert(
             properties={"text": text, "source": source, "title": title, "summary": summary},
             vector=vector,
             uuid=obj_uuid
         )
         print(f"Inserted into Weaviate. UUID: {obj_uuid}")
+        clusters_for(namespace).assign(str(obj_uuid), vector, _node_name({"title": title, "source": source, "text": text}))
         return str(obj_uuid)
     except Exception as e:
         print(f"!!! Error in add_note: {e}")
         raise e
 
-def delete_note(note_id: str) -> bool:
+def add_notes_batch(chunks: list, source: str, title: str, namespace: str = DEFAULT_NAMESPACE) -> list:
+    """Ingests pre-titled chunks with one embedding call and one batched insert."""
+    print(f"--- Ingesting {len(chunks)} chunks (Source: {source}) ---")
+    if not chunks:
+        raise ValueError("No text to ingest.")
+    vectors = embedding_model.encode(chunks)
+    objects = []
+    for i, (chunk, vec) in enumerate(zip(chunks, vectors)):
+        source_name = f"{source} (part {i+1})" if len(chunks) > 1 else source
+        objects.append(DataObject(
+            properties={"text": chunk, "source": source_name, "title": title, "summary": ""},
+            vector=vec.tolist(),
+            uuid=uuid.uuid4()
+        ))
+    result = notes_for(namespace, create=True).data.insert_many(objects)
+    if result.has_errors:
+        raise Exception(f"Batch insert failed for {len(result.errors)} chunks: {next(iter(result.errors.values())).message}")
+    clusters = clusters_for(namespace)
+    for obj in objects:
+        clusters.assign(str(obj.uuid), obj.vector, _node_name(obj.properties))
+    print(f"Inserted {len(objects)} chunks into Weaviate.")
+    return [str(obj.uuid) for obj in objects]
+
+def delete_note(note_id: str, namespace: str = DEFAULT_NAMESPACE) -> bool:
     """Deletes a note by UUID."""
     print(f"--- Deleting Note: {note_id} ---")
     try:
-        notes_collection.data.delete_by_id(uuid.UUID(note_id))
+        collection = notes_for(namespace)
+        if collection is None:
+            raise ValueError(f"Unknown namespace '{namespace}'.")
+        collection.data.delete_by_id(uuid.UUID(note_id))
         print(f"Deleted UUID: {note_id}")
+        clusters_for(namespace).remove(note_id)
         return True
     except Exception as e:
         print(f"!!! Error in delete_note: {e}")
         return False
 
-def update_note(note_id: str, new_text: str) -> bool:
+def update_note(note_id: str, new_text: str, namespace: str = DEFAULT_NAMESPACE) -> bool:
     """Updates a note's text and re-embeds it."""
     print(f"--- Updating Note: {note_id} ---")
     try:
         # Re-embed
         vector = embedding_model.encode(new_text).tolist()
         
-        notes_collection.data.update(
+        collection = notes_for(namespace)
+        if collection is None:
+            raise ValueError(f"Unknown namespace '{namespace}'.")
+        collection.data.update(
             uuid=uuid.UUID(note_id),
             properties={"text": new_text},
             vector=vector
         )
         print(f"Updated UUID: {note_id}")
+        clusters_for(namespace).assign(note_id, vector)
         return True
     except Exception as e:
         print(f"!!! Error in update_note: {e}")
@@ -186,7 +440,7 @@ def chunk_text(text: str, chunk_size: int = 1000, overlap: int = 100):
     
     return chunks
 
-def ingest_pdf(file_path: str) -> str:
+def ingest_pdf(file_path: str, namespace: str = DEFAULT_NAMESPACE) -> str:
     """Extracts text from a PDF, chunks it, and ingests it."""
     print(f"--- Processing PDF: {file_path} ---")
     try:
@@ -206,7 +460,7 @@ def ingest_pdf(file_path: str) -> str:
             print(f"Ingesting chunk {i+1}/{len(chunks)}...")
             # We use the filename + chunk index as source
             source_name = f"{os.path.basename(file_path)} (part {i+1})"
-            uid = add_note(chunk, source=source_name)
+            uid = add_note(chunk, source=source_name, namespace=namespace)
             if first_uuid is None:
                 first_uuid = uid
                 
@@ -215,101 +469,153 @@ def ingest_pdf(file_path: str) -> str:
         print(f"!!! Error in ingest_pdf: {e}")
         raise e
 
-def ingest_generic_file(file_path: str, mime_type: str, api_key: str = "") -> str:
-    """Ingests audio/video/image using Gemini."""
-    print(f"--- Processing File: {file_path} ({mime_type}) ---")
-    
-    if not api_key:
-        # Try env var
-        api_key = os.getenv("GEMINI_API_KEY", "")
-        
+def transcribe_file(file_path: str, mime_type: str, api_key: str = "", content_hash: str = None) -> str:
+    """Transcribes/describes a file with Gemini, cached on disk by content hash and model."""
+    content_hash = content_hash or hash_file(file_path)
+    cached = get_cached(content_hash, GEMINI_MEDIA_MODEL)
+    if cached is not None:
+        print(f"Cache hit for {content_hash[:12]}, skipping Gemini upload.")
+        return cached
+
+    # Only needed on a cache miss, so re-ingesting a known file works without a key
+    api_key = api_key or os.getenv("GEMINI_API_KEY", "")
     if not api_key:
         raise ValueError("Gemini API Key required for multimodal ingestion.")
-        
+
+    genai.configure(api_key=api_key)
+    model = genai.GenerativeModel(GEMINI_MEDIA_MODEL)
+
+    print("Uploading to Gemini...")
+    uploaded_file = genai.upload_file(file_path, mime_type=mime_type)
+    # Audio/video must finish server-side processing before it can be used
+    deadline = time.monotonic() + GEMINI_PROCESSING_TIMEOUT
+    while uploaded_file.state.name == "PROCESSING":
+        if time.monotonic() > deadline:
+            genai.delete_file(uploaded_file.name)
+            raise TimeoutError(f"Gemini still processing {os.path.basename(file_path)} after {GEMINI_PROCESSING_TIMEOUT}s.")
+        time.sleep(2)
+        uploaded_file = genai.get_file(uploaded_file.name)
+    if uploaded_file.state.name == "FAILED":
+        raise ValueError(f"Gemini could not process {os.path.basename(file_path)}.")
+
+    print("Generating content...")
+    prompt = "Analyze this file in detail. If it's audio/video, provide a full transcript. If it's an image, describe every detail. If it's a document, summarize it comprehensively."
+    response = model.generate_content([prompt, uploaded_file])
+    put_cached(content_hash, GEMINI_MEDIA_MODEL, response.text, mime_type)
+    return response.text
+
+def ingest_generic_file(file_path: str, mime_type: str, api_key: str = "", content_hash: str = None, filename: str = None,
+                        namespace: str = DEFAULT_NAMESPACE) -> str:
+    """Ingests audio/video/image using Gemini."""
+    filename = filename or os.path.basename(file_path)
+    print(f"--- Processing File: {filename} ({mime_type}) ---")
+    
     try:
-        genai.configure(api_key=api_key)
-        # Use 2.5 Flash for multimodal speed/cost
-        model = genai.GenerativeModel('gemini-2.5-flash') 
-        
-        print("Uploading to Gemini...")
-        uploaded_file = genai.upload_file(file_path, mime_type=mime_type)
-        
-        print("Generating content...")
-        prompt = "Analyze this file in detail. If it's audio/video, provide a full transcript. If it's an image, describe every detail. If it's a document, summarize it comprehensively."
-        response = model.generate_content([prompt, uploaded_file])
+        text = transcribe_file(file_path, mime_type, api_key, content_hash)
         
-        text = response.text
-        title = f"File: {os.path.basename(file_path)}"
-        
-        # Ingest
-        return add_note(text, source=f"file:{os.path.basename(file_path)}", title=title)
+        # Ingest (long transcripts are chunked and embedded in one batch)
+        uuids = add_notes_batch(chunk_text(text), source=f"file:{filename}", title=f"File: {filename}", namespace=namespace)
+        return uuids[0]
         
     except Exception as e:
         print(f"!!! Error in ingest_generic_file: {e}")
         raise e
 
-def ingest_url_note(url: str) -> str:
+def needs_background_ingest(mime_type: str, size: int, content_hash: str) -> bool:
+    """Long media goes to a background job, unless its transcript is already cached."""
+    if get_cached(content_hash, GEMINI_MEDIA_MODEL) is not None:
+        return False
+    return mime_type.startswith(("audio/", "video/")) or size > MEDIA_ASYNC_MIN_BYTES
+
+ingest_executor = ThreadPoolExecutor(max_workers=2)
+
+def _run_ingest_job(job_id: str, job: dict, fn, args: tuple, cleanup_path: str = None):
+    job["status"] = "processing"
+    save_job(job_id, job)
+    try:
+        job.update(status="stored", uuid=fn(*args))
+    except Exception as e:
+        job.update(status="error", message=str(e))
+    finally:
+        save_job(job_id, job)
+        if cleanup_path and os.path.exists(cleanup_path):
+            os.remove(cleanup_path)
+
+def submit_ingest_job(fn, *args, filename: str = "", cleanup_path: str = None) -> str:
+    """Runs an ingestion function in the background; poll with get_ingest_job."""
+    job_id = uuid.uuid4().hex
+    job = {"status": "queued", "filename": filename}
+    # Persisted (not kept in memory) so a status poll can land on any worker
+    prune_jobs()
+    save_job(job_id, job)
+    ingest_executor.submit(_run_ingest_job, job_id, job, fn, args, cleanup_path)
+    return job_id
+
+def get_ingest_job(job_id: str):
+    return load_job(job_id)
+
+def ingest_url_note(url: str, namespace: str = DEFAULT_NAMESPACE) -> str:
     """Ingests a webpage."""
     data = ingest_url(url)
     # Chunking
     chunks = chunk_text(data['text'])
-    first_uuid = None
-    for i, chunk in enumerate(chunks):
-        source_name = f"{data['source']} (part {i+1})"
-        uid = add_note(chunk, source=source_name, title=data['title'])
-        if first_uuid is None:
-            first_uuid = uid
-    return str(first_uuid)
-
-def ingest_youtube_note(url: str) -> str:
+    return add_notes_batch(chunks, source=data['source'], title=data['title'], namespace=namespace)[0]
+
+def ingest_youtube_note(url: str, namespace: str = DEFAULT_NAMESPACE) -> str:
     """Ingests a YouTube video."""
     data = ingest_youtube(url)
     # Chunking
     chunks = chunk_text(data['text'])
-    first_uuid = None
-    for i, chunk in enumerate(chunks):
-        source_name = f"{data['source']} (part {i+1})"
-        uid = add_note(chunk, source=source_name, title=data['title'])
-        if first_uuid is None:
-            first_uuid = uid
-    return str(first_uuid)
-
-def search_notes(query: str, limit: int = 5):
-    """Hybrid search (Keyword + Vector) for notes."""
+    return add_notes_batch(chunks, source=data['source'], title=data['title'], namespace=namespace)[0]
+
+def search_notes(query: str, limit: int = 5, include_vector: bool = False, namespace: str = DEFAULT_NAMESPACE):
+    """Hybrid search (Keyword + Vector) for notes.
+
+    Vectors are only fetched and returned when `include_vector` is set (Graph RAG needs them;
+    API and MCP callers usually don't).
+    """
     print(f"--- Searching (Hybrid): '{query}' ---")
     try:
         query_vector = embedding_model.encode(query).tolist()
         # Hybrid search: alpha=0.5 balances keyword (BM25) and vector search
-        response = notes_collection.query.hybrid(
+        collection = notes_for(namespace)
+        if collection is None:
+            print(f"Namespace '{namespace}' is empty.")
+            return []
+        response = collection.query.hybrid(
             query=query,
             vector=query_vector,
             limit=limit,
             alpha=0.5,
             return_metadata=["score"],
-            include_vector=True # Needed for Graph RAG
+            return_properties=["text", "source", "title"],
+            include_vector=include_vector
         )
         # Format results
         results = []
         for obj in response.objects:
-            results.append({
+            result = {
                 "text": obj.properties["text"],
                 "source": obj.properties.get("source", "unknown"),
+                "title": obj.properties.get("title", ""),
                 "distance": obj.metadata.score,
-                "vector": obj.vector, # Keep vector for graph traversal
                 "id": str(obj.uuid)
-            })
+            }
+            if include_vector:
+                result["vector"] = _extract_vector(obj.vector) # Keep vector for graph traversal
+            results.append(result)
         print(f"Found {len(results)} results.")
         return results
     except Exception as e:
         print(f"!!! Error in search_notes: {e}")
         return []
 
-def search_with_graph_context(query: str, limit: int = 3, graph_depth: int = 1):
+def search_with_graph_context(query: str, limit: int = 3, graph_depth: int = 1, namespace: str = DEFAULT_NAMESPACE):
     """Graph RAG: Retrieves notes + their semantic neighbors."""
     print(f"--- Graph RAG Search: '{query}' ---")
     
     # 1. Initial Search (Top K)
-    initial_results = search_notes(query, limit=limit)
+    initial_results = search_notes(query, limit=limit, include_vector=True, namespace=namespace)
     
     final_results = {res['id']: res for res in initial_results}
     
@@ -319,10 +625,8 @@ def search_with_graph_context(query: str, limit: int = 3, graph_depth: int = 1):
             # Use the result's vector to find similar notes (edges)
             # We handle vector structure (v4 client)
             vec = res.get('vector')
-            if isinstance(vec, dict):
-                vec = vec.get('default') or list(vec.values())[0]
                 
-            neighbors = notes_collection.query.near_vector(
+            neighbors = notes_for(namespace).query.near_vector(
                 near_vector=vec,
                 limit=2, # Get top 2 neighbors per node
                 return_metadata=["distance"],
@@ -345,18 +649,39 @@ def search_with_graph_context(query: str, limit: int = 3, graph_depth: int = 1):
 
 
 
+# Stable instructions for the local model. Together with the session summary this forms the
+# prompt prefix that stays identical between turns, so Ollama can reuse its cached KV state.
+LOCAL_SYSTEM_PROMPT = """You are MeshMemory, an advanced local knowledge engine. 
+Your goal is to provide accurate, concise, and well-formatted answers based strictly on the provided context.
+
+Guidelines:
+- **Format**: Use Markdown. **Bold** key terms and concepts. Use lists for steps or multiple points.
+- **Tone**: Professional, helpful, and direct.
+- **Accuracy**: If the answer is not in the context, state clearly: "I cannot find this information in your memory."
+- **Citations**: Do not manually cite sources in the text; the system handles that. Focus on the content."""
+
+# Context window requested from Ollama (num_ctx). The reused context is dropped (falling back to
+# summary + recent turns) before the next turn would overflow it, since Ollama would otherwise cut
+# the oldest tokens: the system prompt and summary.
+OLLAMA_NUM_CTX = int(os.getenv("OLLAMA_NUM_CTX", 4096))
+# Tokens reserved for (and capping) each local reply
+OLLAMA_REPLY_TOKENS = int(os.getenv("OLLAMA_REPLY_TOKENS", 1024))
+SESSION_SUMMARY_MAX_CHARS = 1500
+
+sessions = SessionStore()
+# A single background worker folds old turns into session summaries
+summary_executor = ThreadPoolExecutor(max_workers=1)
+
 def ask_groq(question: str, context_text: str, history_text: str, api_key: str) -> str:
     """Queries Groq API."""
     print(f"--- Asking Groq (Cloud) ---")
     try:
         client = Groq(api_key=api_key)
         
+        # History goes in the system message (stable prefix); per-turn context goes with the question
         system_prompt = f"""You are MeshMemory, an advanced knowledge engine.
         Answer strictly based on the context provided.
         
-        Context:
-        {context_text}
-        
         Chat History:
         {history_text}
         """
@@ -365,7 +690,7 @@ def ask_groq(question: str, context_text: str, history_text: str, api_key: str)
             model="llama3-8b-8192",
             messages=[
                 {"role": "system", "content": system_prompt},
-                {"role": "user", "content": question}
+                {"role": "user", "content": f"Context:\n{context_text}\n\nQuestion: {question}"}
             ],
             temperature=0.7,
             max_tokens=1024,
@@ -388,12 +713,12 @@ def ask_gemini(question: str, context_text: str, history_text: str, api_key: str
         prompt = f"""You are MeshMemory, an advanced knowledge engine.
         Answer strictly based on the context provided.
         
-        Context:
-        {context_text}
-        
         Chat History:
         {history_text}
         
+        Context:
+        {context_text}
+        
         User Question: {question}
         """
         
@@ -402,8 +727,87 @@ def ask_gemini(question: str, context_text: str, history_text: str, api_key: str
     except Exception as e:
         return f"Gemini Error: {str(e)}"
 
-def ask_brain(question: str, history: list = [], mode: str = "local", api_key: str = "") -> dict:
-    """RAG: Retrieves context and answers using Ollama OR Gemini."""
+def _estimate_tokens(text: str) -> int:
+    """Rough token count (~3 characters per token, on the safe side for English text)."""
+    return len(text) // 3 + 1
+
+def ask_ollama(question: str, context_text: str, session: Session) -> str:
+    """Queries the local Ollama model, reusing the session's KV context when possible."""
+    system_prompt = LOCAL_SYSTEM_PROMPT
+    if session.summary:
+        system_prompt += f"\n\nSummary of earlier conversation: {session.summary}"
+
+    context = session.ollama_context
+    if context:
+        # Previous turns are already in the model's context; only send what is new
+        prompt = f"Context:\n{context_text}\nUser Question: {question}\n\nAnswer:"
+        if len(context) + _estimate_tokens(prompt) + OLLAMA_REPLY_TOKENS > OLLAMA_NUM_CTX:
+            context = None
+
+    if not context:
+        recent = "".join(f"User: {t['user']}\nAI: {t['ai']}\n" for t in session.recent_turns())
+        prompt = f"Context:\n{context_text}\nChat History:\n{recent}\nUser Question: {question}\n\nAnswer:"
+
+    print(f"Sending prompt to Ollama (Model: {OLLAMA_MODEL}, reused context: {len(context or [])} tokens)...")
+    response = ollama.generate(
+        model=OLLAMA_MODEL,
+        system=None if context else system_prompt,
+        prompt=prompt,
+        context=context,
+        options={"num_ctx": OLLAMA_NUM_CTX, "num_predict": OLLAMA_REPLY_TOKENS}
+    )
+    session.ollama_context = response.get('context')
+    return response['response']
+
+def _complete(prompt: str, mode: str = "local", api_key: str = "") -> str:
+    """Plain completion with the given provider (errors propagate to the caller)."""
+    if mode == "gemini" and api_key:
+        genai.configure(api_key=api_key)
+        return genai.GenerativeModel('gemini-2.5-flash').generate_content(prompt).text
+    if mode == "groq" and api_key:
+        completion = Groq(api_key=api_key).chat.completions.create(
+            model="llama3-8b-8192",
+            messages=[{"role": "user", "content": prompt}],
+            max_tokens=512
+        )
+        return completion.choices[0].message.content
+    response = ollama.chat(model=OLLAMA_MODEL, messages=[{'role': 'user', 'content': prompt}])
+    return response['message']['content']
+
+def _summarize_turns(summary: str, turns: list, mode: str = "local", api_key: str = "") -> str:
+    """Folds turns into the running summary with the session's LLM (truncating if it fails)."""
+    transcript = "".join(f"User: {t['user']}\nAI: {t['ai']}\n" for t in turns)
+    prompt = f"""Update the running summary of a conversation with the new turns below.
+    Keep names, facts and open questions; drop pleasantries. Reply with the summary only, max 150 words.
+    
+    Current summary: {summary or "(none)"}
+    
+    New turns:
+    {transcript}"""
+    try:
+        return _complete(prompt, mode, api_key).strip()[:SESSION_SUMMARY_MAX_CHARS]
+    except Exception as e:
+        print(f"Session summary failed, truncating instead: {e}")
+        folded = " ".join(f"User: {t['user']} AI: {t['ai']}" for t in turns)
+        return (summary + " " + folded).strip()[-SESSION_SUMMARY_MAX_CHARS:]
+
+def _compress_session(session: Session, mode: str = "local", api_key: str = ""):
+    try:
+        turns = session.overflow()
+        if turns:
+            session.fold(len(turns), _summarize_turns(session.summary, turns, mode, api_key))
+            print(f"Session {session.id}: folded {len(turns)} turns into the summary.")
+    finally:
+        session.compressing = False
+
+def ask_brain(question: str, history: list = [], mode: str = "local", api_key: str = "", session_id: str = "",
+              namespace: str = DEFAULT_NAMESPACE) -> dict:
+    """RAG: Retrieves context and answers using Ollama OR Gemini.
+
+    Conversation state is kept server-side: pass the returned `session_id` back on the next
+    call. `history` only seeds a new session; `session_new` tells the caller that happened
+    (e.g. the old session expired or lives in another worker).
+    """
     
     # Check for env var if api_key not provided
     if not api_key:
@@ -419,9 +823,13 @@ def ask_brain(question: str, history: list = [], mode: str = "local", api_key: s
             api_key = gemini_key
 
     print(f"--- Asking Brain: '{question}' (Mode: {mode}) ---")
+    namespace = namespace or DEFAULT_NAMESPACE
+    session, created = sessions.get_or_create(session_id, history, namespace)
+    if created and session_id:
+        print(f"Session {session_id} not found in namespace {namespace}; started {session.id}.")
     
     # 1. Retrieve (Graph RAG)
-    context_docs = search_with_graph_context(question, limit=5)
+    context_docs = search_with_graph_context(question, limit=5, namespace=namespace)
     
     # 2. Prepare Context
     context_text = ""
@@ -437,127 +845,255 @@ def ask_brain(question: str, history: list = [], mode: str = "local", api_key: s
     # Deduplicate sources
     sources = list(set(sources))
             
-    # 3. Prepare History Text
-    history_text = ""
-    for turn in history[-3:]: # Keep last 3 turns
-        history_text += f"User: {turn['user']}\nAI: {turn['ai']}\n"
-    
-    # 4. Route Request
-    if mode == "gemini" and api_key:
-        answer = ask_gemini(question, context_text, history_text, api_key)
-        return {"answer": answer, "sources": sources}
-    elif mode == "groq" and api_key:
-        answer = ask_groq(question, context_text, history_text, api_key)
-        return {"answer": answer, "sources": sources}
-    
-    # 5. Local Fallback (Ollama)
-    prompt = f"""You are MeshMemory, an advanced local knowledge engine. 
-    Your goal is to provide accurate, concise, and well-formatted answers based strictly on the provided context.
-    
-    Guidelines:
-    - **Format**: Use Markdown. **Bold** key terms and concepts. Use lists for steps or multiple points.
-    - **Tone**: Professional, helpful, and direct.
-    - **Accuracy**: If the answer is not in the context, state clearly: "I cannot find this information in your memory."
-    - **Citations**: Do not manually cite sources in the text; the system handles that. Focus on the content.
-    
-    Context:
-    {context_text}
-    
-    Chat History:
-    {history_text}
-    
-    User Question: {question}
-    
-    Answer:"""
-    
+    # 3. Route Request (history = rolling summary + recent turns)
     try:
-        print(f"Sending prompt to Ollama (Model: {OLLAMA_MODEL})...")
-        response = ollama.chat(model=OLLAMA_MODEL, messages=[
-            {'role': 'user', 'content': prompt},
-        ])
-        answer = response['message']['content']
-        print(f"Ollama Response: {answer[:100]}...")
-        return {"answer": answer, "sources": sources}
+        if mode == "gemini" and api_key:
+            answer = ask_gemini(question, context_text, session.history_text(), api_key)
+        elif mode == "groq" and api_key:
+            answer = ask_groq(question, context_text, session.history_text(), api_key)
+        else:
+            # 4. Local Fallback (Ollama)
+            answer = ask_ollama(question, context_text, session)
+            print(f"Ollama Response: {answer[:100]}...")
     except Exception as e:
         error_msg = f"Error talking to Ollama: {str(e)}. Is 'ollama serve' running?"
         print(f"!!! {error_msg}")
-        return {"answer": error_msg, "sources": []}
+        return {"answer": error_msg, "sources": [], "session_id": session.id, "session_new": created}
+
+    # 5. Remember the turn; fold older turns into the summary off the request path
+    session.add_turn(question, answer)
+    if session.overflow() and not session.compressing:
+        session.compressing = True
+        summary_executor.submit(_compress_session, session, mode, api_key)
+    return {"answer": answer, "sources": sources, "session_id": session.id, "session_new": created}
+
+def _extract_vector(vec):
+    """Normalizes the v4 client's vector field (dict of named vectors or list) to a list."""
+    if isinstance(vec, dict):
+        vec = vec.get('default') or list(vec.values())[0]
+    return vec
+
+def _encode_vector(vec) -> str:
+    """Packs a vector as base64 little-endian float32 (~4x smaller than a JSON float list)."""
+    return base64.b64encode(np.asarray(vec, dtype="<f4").tobytes()).decode("ascii")
+
+def _note_to_dict(obj, include_vector: bool = False) -> dict:
+    """Formats a Weaviate object for listing/export."""
+    note = {
+        "id": str(obj.uuid),
+        "text": obj.properties.get("text", ""),
+        "source": obj.properties.get("source", "unknown"),
+        "title": obj.properties.get("title", ""),
+        "summary": obj.properties.get("summary", ""),
+    }
+    if include_vector:
+        note["vector"] = _encode_vector(_extract_vector(obj.vector))
+        note["vector_dtype"] = "float32"
+    return note
 
-def get_graph_data(threshold: float = 0.6):
-    """Retrieves nodes and creates semantic links."""
+def list_notes(limit: int = 50, after: str = None, include_vector: bool = False, namespace: str = DEFAULT_NAMESPACE) -> dict:
+    """Cursor-paginated listing. Pass the returned `next_cursor` as `after` to get the next page."""
+    print(f"--- Listing Notes (limit: {limit}, after: {after}) ---")
+    collection = notes_for(namespace)
+    if collection is None:
+        return {"notes": [], "next_cursor": None}
+    response = collection.query.fetch_objects(
+        limit=limit,
+        after=uuid.UUID(after) if after else None,
+        include_vector=include_vector
+    )
+    notes = [_note_to_dict(obj, include_vector) for obj in response.objects]
+    # A short page means we reached the end of the collection
+    next_cursor = notes[-1]["id"] if len(notes) == limit else None
+    return {"notes": notes, "next_cursor": next_cursor}
+
+def iter_notes(include_vector: bool = False, return_properties: list = None, batch_size: int = ITERATOR_BATCH_SIZE,
+               namespace: str = DEFAULT_NAMESPACE):
+    """Streams every object in the namespace using the Weaviate cursor iterator."""
+    collection = notes_for(namespace)
+    if collection is None:
+        return iter([])
+    return collection.iterator(
+        include_vector=include_vector,
+        return_properties=return_properties,
+        cache_size=batch_size
+    )
+
+def iter_batches(iterable, batch_size: int = ITERATOR_BATCH_SIZE):
+    """Groups an iterable into lists of at most `batch_size` items."""
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def export_notes(include_vector: bool = False, namespace: str = DEFAULT_NAMESPACE):
+    """Yields the whole collection as NDJSON lines (one note per line)."""
+    print(f"--- Exporting Notes (vectors: {include_vector}) ---")
+    count = 0
+    for obj in iter_notes(include_vector=include_vector, namespace=namespace):
+        count += 1
+        yield json.dumps(_note_to_dict(obj, include_vector), ensure_ascii=False) + "\n"
+    print(f"Exported {count} notes.")
+
+def _node_name(props: dict) -> str:
+    """Smart Naming: Use Title if available, else Source, else Text snippet."""
+    title = props.get("title", "")
+    source = props.get("source", "unknown")
+
+    if title and title != "unknown":
+        return title[:30] + "..." if len(title) > 30 else title
+    if source and source != "user" and source != "unknown":
+        name = os.path.basename(source) # Clean up path/url
+        return name[:20] + "..." if len(name) > 20 else name
+    return props.get("text", "")[:20] + "..."
+
+def count_notes(namespace: str = DEFAULT_NAMESPACE) -> int:
+    collection = notes_for(namespace)
+    if collection is None:
+        return 0
+    return collection.aggregate.over_all(total_count=True).total_count
+
+def _ensure_clusters(namespace: str = DEFAULT_NAMESPACE) -> ClusterIndex:
+    """Rebuilds the cluster index if it drifted or another process changed the collection."""
+    cluster_index = clusters_for(namespace)
+    if not cluster_index.is_stale and cluster_index.size == count_notes(namespace):
+        return cluster_index
+    print(f"--- Rebuilding note clusters ({namespace}) ---")
+    ids, vectors, names = [], [], []
+    for obj in iter_notes(include_vector=True, return_properties=["text", "source", "title"], namespace=namespace):
+        ids.append(str(obj.uuid))
+        vectors.append(_extract_vector(obj.vector))
+        names.append(_node_name(obj.properties))
+    cluster_index.build(ids, vectors, names)
+    return cluster_index
+
+def get_cluster_graph(threshold: float = 0.6, namespace: str = DEFAULT_NAMESPACE):
+    """Aggregated graph: one node per cluster, labelled after its most central note."""
+    print(f"--- Fetching Cluster Graph (Threshold: {threshold}) ---")
+    try:
+        if notes_for(namespace) is None:
+            return {"level": "clusters", "epoch": None, "nodes": [], "links": []}
+        with clusters_for(namespace).lock:
+            graph = _ensure_clusters(namespace).summary(threshold)
+        print(f"Generated {len(graph['nodes'])} cluster nodes and {len(graph['links'])} links.")
+        return {"level": "clusters", **graph}
+    except Exception as e:
+        print(f"!!! Error in get_cluster_graph: {e}")
+        return {"level": "clusters", "nodes": [], "links": []}
+
+def get_cluster_detail(cluster_id: int, threshold: float = 0.6, namespace: str = DEFAULT_NAMESPACE, epoch: str = None):
+    """Expands one cluster into its member notes and their semantic links.
+
+    Pass the `epoch` returned by get_cluster_graph: cluster ids are renumbered on every
+    rebuild, so an id from another epoch is answered with `stale: true` and no nodes.
+    """
+    print(f"--- Expanding Cluster {cluster_id} (epoch: {epoch}) ---")
+    try:
+        if notes_for(namespace) is None:
+            return {"level": "notes", "cluster": cluster_id, "epoch": None, "nodes": [], "links": []}
+        with clusters_for(namespace).lock:
+            cluster_index = clusters_for(namespace)
+            # Expanding the clustering the client is looking at must not trigger a rebuild
+            if epoch is None or cluster_index.epoch != epoch:
+                cluster_index = _ensure_clusters(namespace)
+            if epoch is not None and cluster_index.epoch != epoch:
+                print(f"Cluster epoch {epoch} is stale (current: {cluster_index.epoch}).")
+                return {"level": "notes", "cluster": cluster_id, "epoch": cluster_index.epoch,
+                        "stale": True, "nodes": [], "links": []}
+            members = cluster_index.members(cluster_id)
+            links = cluster_index.member_links(members, threshold)
+        nodes = []
+        for batch in iter_batches(members):
+            response = notes_for(namespace).query.fetch_objects(
+                filters=Filter.by_id().contains_any(batch),
+                limit=len(batch),
+                return_properties=["text", "source", "title"]
+            )
+            for obj in response.objects:
+                nodes.append({
+                    "id": str(obj.uuid),
+                    "name": _node_name(obj.properties),
+                    "fullText": obj.properties.get("text", ""),
+                    "source": obj.properties.get("source", "unknown"),
+                    "val": 1,
+                    "cluster": cluster_id
+                })
+        return {"level": "notes", "cluster": cluster_id, "epoch": cluster_index.epoch, "nodes": nodes, "links": links}
+    except Exception as e:
+        print(f"!!! Error in get_cluster_detail: {e}")
+        return {"level": "notes", "cluster": cluster_id, "nodes": [], "links": []}
+
+def get_graph_data(threshold: float = 0.6, lod: bool = True, namespace: str = DEFAULT_NAMESPACE):
+    """Retrieves nodes and creates semantic links.
+
+    With `lod`, large collections are returned as clusters (see get_cluster_graph).
+    """
     print(f"--- Fetching Graph Data (Semantic, Threshold: {threshold}) ---")
     try:
-        # Fetch notes with vectors
-        response = notes_collection.query.fetch_objects(
-            limit=500, 
-            return_properties=["text", "source", "title"],
-            include_vector=True
-        )
-        
+        if lod and count_notes(namespace) > GRAPH_LOD_NODE_LIMIT:
+            return get_cluster_graph(threshold, namespace)
+
         nodes = []
         links = []
-        vectors = []
         ids = []
-        
-        # 1. Create Nodes & Collect Vectors
-        if not response.objects:
-            print("Graph is empty.")
-            return {"nodes": [], "links": []}
+        # Normalized vectors of every batch seen so far, one block per batch
+        blocks = []
+
+        # Walk the whole collection in bounded batches. Each new batch is compared
+        # against itself and the earlier blocks, so we never build the full NxN matrix.
+        objects = iter_notes(include_vector=True, return_properties=["text", "source", "title"], namespace=namespace)
+        for batch in iter_batches(objects):
+            # 1. Create Nodes & Collect Vectors
+            batch_vectors = []
+            for obj in batch:
+                nodes.append({
+                    "id": str(obj.uuid),
+                    "name": _node_name(obj.properties),
+                    "fullText": obj.properties.get("text", ""),
+                    "source": obj.properties.get("source", "unknown"),
+                    "val": 1
+                })
+                batch_vectors.append(_extract_vector(obj.vector))
 
-        for obj in response.objects:
-            # Handle vector structure (v4 client)
-            vec = obj.vector
-            if isinstance(vec, dict):
-                vec = vec.get('default') or list(vec.values())[0]
-            
-            # Smart Naming: Use Title if available, else Source, else Text snippet
-            title = obj.properties.get("title", "")
-            source = obj.properties.get("source", "unknown")
-            text_snippet = obj.properties.get("text", "")[:20] + "..."
-            
-            if title and title != "unknown":
-                name = title[:30] + "..." if len(title) > 30 else title
-            elif source and source != "user" and source != "unknown":
-                name = os.path.basename(source) # Clean up path/url
-                if len(name) > 20: name = name[:20] + "..."
-            else:
-                name = text_snippet
-
-            nodes.append({
-                "id": str(obj.uuid),
-                "name": name,
-                "fullText": obj.properties.get("text", ""),
-                "source": source,
-                "val": 1
-            })
-            vectors.append(vec)
-            ids.append(str(obj.uuid))
-            
-        # 2. Compute Semantic Links (Cosine Similarity)
-        if len(vectors) > 1:
-            # Convert to numpy array
-            vec_matrix = np.array(vectors)
-            
             # Normalize vectors (L2 norm)
+            vec_matrix = np.asarray(batch_vectors, dtype=np.float32)
             norms = np.linalg.norm(vec_matrix, axis=1, keepdims=True)
-            normalized_matrix = vec_matrix / (norms + 1e-9) # Avoid divide by zero
-            
-            # Compute similarity matrix (Dot product of normalized vectors)
-            sim_matrix = np.dot(normalized_matrix, normalized_matrix.T)
-            
-            # Create links for high similarity using configurable threshold
-            for i in range(len(ids)):
-                for j in range(i + 1, len(ids)): # Upper triangle only
-                    sim = sim_matrix[i][j]
-                    if sim > threshold:
-                        links.append({
-                            "source": ids[i],
-                            "target": ids[j],
-                            "value": float(sim) # Strength of link
-                        })
-                        
+            block = vec_matrix / (norms + 1e-9) # Avoid divide by zero
+            offset = len(ids)
+            ids.extend(str(obj.uuid) for obj in batch)
+
+            # 2. Compute Semantic Links (Cosine Similarity) against earlier blocks...
+            prev_offset = 0
+            for prev in blocks:
+                sim = block @ prev.T
+                for i, j in zip(*np.nonzero(sim > threshold)):
+                    links.append({
+                        "source": ids[prev_offset + j],
+                        "target": ids[offset + i],
+                        "value": float(sim[i, j]) # Strength of link
+                    })
+                prev_offset += len(prev)
+
+            # ...and within the batch (upper triangle only)
+            sim = block @ block.T
+            for i, j in zip(*np.nonzero(np.triu(sim > threshold, k=1))):
+                links.append({
+                    "source": ids[offset + i],
+                    "target": ids[offset + j],
+                    "value": float(sim[i, j])
+                })
+            blocks.append(block)
+
+        if not nodes:
+            print("Graph is empty.")
+            return {"level": "notes", "nodes": [], "links": []}
+
         print(f"Generated {len(nodes)} nodes and {len(links)} semantic links (Threshold: {threshold}).")
-        return {"nodes": nodes, "links": links}
+        return {"level": "notes", "nodes": nodes, "links": links}
     except Exception as e:
         print(f"!!! Error in get_graph_data: {e}")
-        return {"nodes": [], "links": []}
+        return {"level": "notes", "nodes": [], "links": []}
@@ -0,0 +1,220 @@
+"""Shared embedding service: one process owns the model, workers connect over a local socket.
+
+Run it once next to the API / MCP server:
+
+    python embedding_service.py            # listens on EMBEDDING_SERVICE_ADDR
+
+and set EMBEDDING_SERVICE_ADDR in the workers' .env (e.g. 127.0.0.1:8765 or
+unix:/tmp/meshmemory-embed.sock). Concurrent encode requests are coalesced into
+micro-batches of at most EMBEDDING_MAX_BATCH texts, waiting at most
+EMBEDDING_MAX_WAIT_MS for a batch to fill.
+
+Wire format (both directions): 4-byte big-endian length + payload.
+Request: JSON list of strings. Response: JSON header {"shape": [n, dim]} or
+{"error": "..."}, followed (on success) by a frame of little-endian float32s.
+"""
+import os
+import json
+import socket
+import struct
+import asyncio
+import threading
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# --- Configuration ---
+EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2"
+EMBEDDING_SERVICE_ADDR = os.getenv("EMBEDDING_SERVICE_ADDR", "127.0.0.1:8765")
+EMBEDDING_MAX_BATCH = int(os.getenv("EMBEDDING_MAX_BATCH", 64))
+EMBEDDING_MAX_WAIT_MS = float(os.getenv("EMBEDDING_MAX_WAIT_MS", 5))
+
+_HEADER = struct.Struct(">I")
+
+
+def parse_addr(addr: str):
+    """Returns ("unix", path) or ("tcp", (host, port))."""
+    if addr.startswith("unix:"):
+        return "unix", addr[len("unix:"):]
+    host, _, port = addr.rpartition(":")
+    return "tcp", (host or "127.0.0.1", int(port))
+
+
+# --- Server ---
+
+class MicroBatcher:
+    """Collects concurrent encode requests and runs them through the model together."""
+
+    def __init__(self, encode_fn, max_batch_size: int = EMBEDDING_MAX_BATCH, max_wait_ms: float = EMBEDDING_MAX_WAIT_MS):
+        self.encode_fn = encode_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.queue = asyncio.Queue()
+        self.batches = 0
+        self.texts = 0
+
+    async def submit(self, texts: list) -> np.ndarray:
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((texts, future))
+        return await future
+
+    async def _collect(self) -> list:
+        """Waits for one request, then gathers more until the batch is full or the window closes."""
+        loop = asyncio.get_running_loop()
+        items = [await self.queue.get()]
+        size = len(items[0][0])
+        deadline = loop.time() + self.max_wait
+        while size < self.max_batch_size:
+            try:
+                if self.queue.empty():
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        break
+                    item = await asyncio.wait_for(self.queue.get(), remaining)
+                else:
+                    item = self.queue.get_nowait()
+            except asyncio.TimeoutError:
+                break
+            items.append(item)
+            size += len(item[0])
+        return items
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            items = await self._collect()
+            texts = [text for batch, _ in items for text in batch]
+            try:
+                # The model releases the GIL while encoding, so keep the event loop free meanwhile
+                vectors = await loop.run_in_executor(None, self.encode_fn, texts)
+            except Exception as e:
+                for _, future in items:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            self.batches += 1
+            self.texts += len(texts)
+            offset = 0
+            for batch, future in items:
+                if not future.done():
+                    future.set_result(vectors[offset:offset + len(batch)])
+                offset += len(batch)
+
+
+async def _read_frame(reader: asyncio.StreamReader) -> bytes:
+    (length,) = _HEADER.unpack(await reader.readexactly(_HEADER.size))
+    return await reader.readexactly(length)
+
+
+def _write_frame(writer: asyncio.StreamWriter, payload: bytes):
+    writer.write(_HEADER.pack(len(payload)) + payload)
+
+
+async def _handle_connection(batcher: MicroBatcher, reader, writer):
+    try:
+        while True:
+            texts = json.loads(await _read_frame(reader))
+            try:
+                if not isinstance(texts, list) or not all(isinstance(t, str) for t in texts):
+                    raise ValueError("Request must be a JSON list of strings.")
+                vectors = np.asarray(await batcher.submit(texts), dtype="<f4") if texts else np.zeros((0, 0), dtype="<f4")
+                _write_frame(writer, json.dumps({"shape": list(vectors.shape)}).encode())
+                _write_frame(writer, vectors.tobytes())
+            except Exception as e:
+                _write_frame(writer, json.dumps({"error": str(e)}).encode())
+            await writer.drain()
+    except (asyncio.IncompleteReadError, ConnectionResetError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(batcher: MicroBatcher, addr: str = EMBEDDING_SERVICE_ADDR, ready: threading.Event = None):
+    """Runs the embedding service until cancelled."""
+    handler = lambda r, w: _handle_connection(batcher, r, w)
+    kind, target = parse_addr(addr)
+    if kind == "unix":
+        if os.path.exists(target):
+            os.remove(target)
+        server = await asyncio.start_unix_server(handler, path=target)
+    else:
+        server = await asyncio.start_server(handler, host=target[0], port=target[1])
+    print(f"Embedding service listening on {addr} (max batch {batcher.max_batch_size}, max wait {batcher.max_wait * 1000:g}ms)")
+    if ready:
+        ready.set()
+    async with server:
+        await asyncio.gather(server.serve_forever(), batcher.run())
+
+
+# --- Client ---
+
+class RemoteEmbedder:
+    """Drop-in for SentenceTransformer.encode that talks to the embedding service."""
+
+    def __init__(self, addr: str = EMBEDDING_SERVICE_ADDR, timeout: float = 30):
+        self.addr = addr
+        self.timeout = timeout
+        self._local = threading.local() # One connection per thread
+
+    def _connect(self) -> socket.socket:
+        kind, target = parse_addr(self.addr)
+        family = socket.AF_UNIX if kind == "unix" else socket.AF_INET
+        sock = socket.socket(family, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(target)
+        if kind == "tcp":
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return sock
+
+    def _recv_exact(self, sock: socket.socket, size: int) -> bytes:
+        buf = bytearray()
+        while len(buf) < size:
+            chunk = sock.recv(size - len(buf))
+            if not chunk:
+                raise ConnectionError("Embedding service closed the connection.")
+            buf.extend(chunk)
+        return bytes(buf)
+
+    def _recv_frame(self, sock: socket.socket) -> bytes:
+        (length,) = _HEADER.unpack(self._recv_exact(sock, _HEADER.size))
+        return self._recv_exact(sock, length)
+
+    def _request(self, texts: list) -> np.ndarray:
+        sock = getattr(self._local, "sock", None)
+        if sock is None:
+            sock = self._local.sock = self._connect()
+        payload = json.dumps(texts).encode()
+        sock.sendall(_HEADER.pack(len(payload)) + payload)
+        header = json.loads(self._recv_frame(sock))
+        if "error" in header:
+            raise RuntimeError(f"Embedding service error: {header['error']}")
+        return np.frombuffer(self._recv_frame(sock), dtype="<f4").reshape(header["shape"])
+
+    def _close(self):
+        sock = getattr(self._local, "sock", None)
+        self._local.sock = None
+        if sock is not None:
+            sock.close()
+
+    def encode(self, sentences, **kwargs) -> np.ndarray:
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        try:
+            vectors = self._request(texts)
+        except (OSError, ConnectionError):
+            # Stale connection (e.g. service restarted): reconnect once
+            self._close()
+            vectors = self._request(texts)
+        return vectors[0] if single else vectors
+
+
+if __name__ == "__main__":
+    from sentence_transformers import SentenceTransformer
+
+    model = SentenceTransformer(EMBEDDING_MODEL_NAME)
+    encode = lambda texts: model.encode(texts, batch_size=EMBEDDING_MAX_BATCH, convert_to_numpy=True)
+    try:
+        asyncio.run(serve(MicroBatcher(encode)))
+    except KeyboardInterrupt:
+        pass
@@ -1,33 +1,45 @@
 from fastapi import FastAPI, UploadFile, File, Request, Form
 from pydantic import BaseModel
 from fastapi.middleware.cors import CORSMiddleware
-from core_logic import add_note, search_notes, ask_brain, ingest_pdf, get_graph_data, delete_note, update_note, ingest_url_note, ingest_youtube_note, ingest_generic_file
+from fastapi.responses import StreamingResponse, ORJSONResponse
+from core_logic import add_note, search_notes, ask_brain, ingest_pdf, get_graph_data, delete_note, update_note, ingest_url_note, ingest_youtube_note, ingest_generic_file, list_notes, export_notes, get_cluster_detail, needs_background_ingest, submit_ingest_job, get_ingest_job, notes_for, list_namespaces, offload_namespace, activate_namespace, check_schema, DEFAULT_NAMESPACE
+from media_cache import save_upload
+import uuid as uuid_lib
 import shutil
 import os
 from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
 
+# Refuse to serve against a collection whose multi-tenancy doesn't match MULTI_TENANCY
+check_schema()
+
 # Rate Limiting Setup
 limiter = Limiter(key_func=get_remote_address)
 
 class QARequest(BaseModel):
     query: str
-    history: list = []
+    session_id: str = "" # Returned by /qa; keeps the conversation server-side
+    history: list = [] # Recent turns; only used to seed a new (or lost) session
     mode: str = "local"
     api_key: str = ""
+    namespace: str = DEFAULT_NAMESPACE
 
 class IngestRequest(BaseModel):
     text: str
     source: str = "user"
+    namespace: str = DEFAULT_NAMESPACE
 
 class IngestURLRequest(BaseModel):
     url: str
+    namespace: str = DEFAULT_NAMESPACE
 
 class UpdateRequest(BaseModel):
     text: str
+    namespace: str = DEFAULT_NAMESPACE
 
-app = FastAPI(title="MeshMemory API")
+# orjson serializes our (float-heavy) responses several times faster than the stdlib encoder
+app = FastAPI(title="MeshMemory API", default_response_class=ORJSONResponse)
 app.state.limiter = limiter
 app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
 
@@ -49,14 +61,14 @@ def root():
 async def ingest(req: IngestRequest, request: Request):
     """Ingest a note."""
     try:
-        uuid = add_note(req.text, req.source)
+        uuid = add_note(req.text, req.source, namespace=req.namespace)
         return {"status": "stored", "uuid": uuid}
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
 @app.post("/ingest/pdf")
 @limiter.limit("5/minute")
-async def ingest_pdf_endpoint(request: Request, file: UploadFile = File(...)):
+async def ingest_pdf_endpoint(request: Request, file: UploadFile = File(...), namespace: str = Form(DEFAULT_NAMESPACE)):
     """Ingest a PDF file."""
     try:
         # Save temp file
@@ -65,7 +77,7 @@ async def ingest_pdf_endpoint(request: Request, file: UploadFile = File(...)):
             shutil.copyfileobj(file.file, buffer)
             
         # Ingest
-        uuid = ingest_pdf(temp_path)
+        uuid = ingest_pdf(temp_path, namespace)
         
         # Cleanup
         os.remove(temp_path)
@@ -76,38 +88,51 @@ async def ingest_pdf_endpoint(request: Request, file: UploadFile = File(...)):
 
 @app.post("/ingest/file")
 @limiter.limit("5/minute")
-async def ingest_file_endpoint(request: Request, file: UploadFile = File(...), api_key: str = Form(None)):
-    """Ingest any file (Audio/Video/Image) using Gemini."""
+async def ingest_file_endpoint(request: Request, file: UploadFile = File(...), api_key: str = Form(None),
+                               namespace: str = Form(DEFAULT_NAMESPACE)):
+    """Ingest any file (Audio/Video/Image) using Gemini. Long media is processed in the background."""
+    filename = os.path.basename(file.filename or "upload")
+    temp_path = f"temp_{uuid_lib.uuid4().hex}_{filename}"
     try:
-        # Save temp file
-        temp_path = f"temp_{file.filename}"
-        with open(temp_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        # Save temp file, hashing it while it is received
+        content_hash, size = save_upload(file.file, temp_path)
             
         # Determine mime type (basic)
         mime_type = file.content_type or "application/octet-stream"
         
         # Ingest
         if mime_type == "application/pdf":
-             uuid = ingest_pdf(temp_path)
+             uuid = ingest_pdf(temp_path, namespace)
+        elif needs_background_ingest(mime_type, size, content_hash):
+             job_id = submit_ingest_job(ingest_generic_file, temp_path, mime_type, api_key, content_hash, filename, namespace,
+                                        filename=filename, cleanup_path=temp_path)
+             return {"status": "processing", "job_id": job_id, "filename": filename}
         else:
-             uuid = ingest_generic_file(temp_path, mime_type, api_key)
+             uuid = ingest_generic_file(temp_path, mime_type, api_key, content_hash, filename, namespace)
         
         # Cleanup
         os.remove(temp_path)
         
-        return {"status": "stored", "uuid": uuid, "filename": file.filename}
+        return {"status": "stored", "uuid": uuid, "filename": filename}
     except Exception as e:
-        if os.path.exists(f"temp_{file.filename}"):
-            os.remove(f"temp_{file.filename}")
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
         return {"status": "error", "message": str(e)}
 
+@app.get("/ingest/jobs/{job_id}")
+async def ingest_job_status(job_id: str):
+    """Status of a background ingestion job (queued, processing, stored or error)."""
+    job = get_ingest_job(job_id)
+    if job is None:
+        return {"status": "error", "message": "Unknown job"}
+    return {"job_id": job_id, **job}
+
 @app.post("/ingest/url")
 @limiter.limit("5/minute")
 async def ingest_url_endpoint(req: IngestURLRequest, request: Request):
     """Ingest a URL."""
     try:
-        uuid = ingest_url_note(req.url)
+        uuid = ingest_url_note(req.url, req.namespace)
         return {"status": "stored", "uuid": uuid}
     except Exception as e:
         return {"status": "error", "message": str(e)}
@@ -117,34 +142,63 @@ async def ingest_url_endpoint(req: IngestURLRequest, request: Request):
 async def ingest_youtube_endpoint(req: IngestURLRequest, request: Request):
     """Ingest a YouTube video."""
     try:
-        uuid = ingest_youtube_note(req.url)
+        uuid = ingest_youtube_note(req.url, req.namespace)
         return {"status": "stored", "uuid": uuid}
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
 @app.get("/search")
 @limiter.limit("20/minute")
-async def search(request: Request, query: str):
-    """Search notes."""
-    results = search_notes(query)
+async def search(request: Request, query: str, limit: int = 5, include_vector: bool = False, namespace: str = DEFAULT_NAMESPACE):
+    """Search notes (embedding vectors are only returned when include_vector=true)."""
+    results = search_notes(query, min(max(limit, 1), 50), include_vector, namespace)
     return {"results": results}
 
 @app.get("/graph")
-async def graph(threshold: float = 0.6):
-    """Get knowledge graph data."""
-    return get_graph_data(threshold)
+async def graph(threshold: float = 0.6, lod: bool = True, namespace: str = DEFAULT_NAMESPACE):
+    """Get knowledge graph data (clustered when the collection is large, unless lod=false)."""
+    return get_graph_data(threshold, lod, namespace)
+
+@app.get("/graph/cluster/{cluster_id}")
+async def graph_cluster(cluster_id: int, threshold: float = 0.6, namespace: str = DEFAULT_NAMESPACE, epoch: str = None):
+    """Expand a cluster node into its notes (pass the `epoch` from /graph to detect renumbered clusters)."""
+    return get_cluster_detail(cluster_id, threshold, namespace, epoch)
 
 @app.post("/qa")
 @limiter.limit("10/minute")
 async def qa(req: QARequest, request: Request):
     """Ask the brain."""
-    response = ask_brain(req.query, req.history, req.mode, req.api_key)
-    return {"query": req.query, "answer": response["answer"], "sources": response["sources"]}
+    response = ask_brain(req.query, req.history, req.mode, req.api_key, req.session_id, req.namespace)
+    return {"query": req.query, "answer": response["answer"], "sources": response["sources"], "session_id": response["session_id"], "session_new": response["session_new"]}
+
+@app.get("/notes")
+@limiter.limit("30/minute")
+async def notes(request: Request, limit: int = 50, after: str = None, include_vector: bool = False,
+                namespace: str = DEFAULT_NAMESPACE):
+    """List notes page by page (pass `next_cursor` back as `after`)."""
+    try:
+        return list_notes(min(max(limit, 1), 500), after, include_vector, namespace)
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+
+@app.get("/notes/export")
+@limiter.limit("2/minute")
+async def export(request: Request, include_vector: bool = False, namespace: str = DEFAULT_NAMESPACE):
+    """Stream every note as NDJSON. Vectors are base64 float32 when requested."""
+    try:
+        notes_for(namespace) # Validate before the stream starts
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+    return StreamingResponse(
+        export_notes(include_vector, namespace),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": f"attachment; filename=meshmemory_{namespace}.ndjson"}
+    )
 
 @app.delete("/notes/{note_id}")
-async def delete_note_endpoint(note_id: str):
+async def delete_note_endpoint(note_id: str, namespace: str = DEFAULT_NAMESPACE):
     """Delete a note."""
-    success = delete_note(note_id)
+    success = delete_note(note_id, namespace)
     if success:
         return {"status": "deleted", "uuid": note_id}
     else:
@@ -153,8 +207,32 @@ async def delete_note_endpoint(note_id: str):
 @app.put("/notes/{note_id}")
 async def update_note_endpoint(note_id: str, req: UpdateRequest):
     """Update a note."""
-    success = update_note(note_id, req.text)
+    success = update_note(note_id, req.text, req.namespace)
     if success:
         return {"status": "updated", "uuid": note_id}
     else:
-        return {"status": "error", "message": "Failed to update"}
\ No newline at end of file
+        return {"status": "error", "message": "Failed to update"}
+
+@app.get("/namespaces")
+async def namespaces():
+    """List namespaces and whether they are active or offloaded."""
+    try:
+        return {"namespaces": list_namespaces()}
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+
+@app.post("/namespaces/{namespace}/offload")
+async def offload_namespace_endpoint(namespace: str):
+    """Move an idle namespace to cold storage."""
+    if offload_namespace(namespace):
+        return {"status": "offloaded", "namespace": namespace}
+    else:
+        return {"status": "error", "message": "Failed to offload (is MULTI_TENANCY enabled?)"}
+
+@app.post("/namespaces/{namespace}/activate")
+async def activate_namespace_endpoint(namespace: str):
+    """Bring an offloaded namespace back into memory."""
+    if activate_namespace(namespace):
+        return {"status": "active", "namespace": namespace}
+    else:
+        return {"status": "error", "message": "Failed to activate (is MULTI_TENANCY enabled?)"}
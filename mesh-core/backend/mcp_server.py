@@ -1,24 +1,63 @@
+import os
 from mcp.server.fastmcp import FastMCP
-from core_logic import add_note, search_notes, ask_brain
+from core_logic import add_note, search_notes, ask_brain, check_schema, DEFAULT_NAMESPACE
+
+check_schema()
 
 # Create an MCP server
 mcp = FastMCP("MeshMemory")
 
+# Output limits keep tool results small in the model's context window
+MCP_MAX_RESULT_CHARS = int(os.getenv("MCP_MAX_RESULT_CHARS", 400))
+MCP_MAX_OUTPUT_CHARS = int(os.getenv("MCP_MAX_OUTPUT_CHARS", 4000))
+# Scope this MCP server to one project/user by default (tools can still pass another namespace)
+MCP_NAMESPACE = os.getenv("MCP_NAMESPACE", DEFAULT_NAMESPACE)
+
+def truncate(text: str, limit: int) -> str:
+    """Collapses whitespace and cuts text to `limit` characters."""
+    text = " ".join(text.split())
+    return text if len(text) <= limit else text[:limit - 1].rstrip() + "…"
+
+def format_results(results: list) -> str:
+    """Renders search hits as numbered plain-text lines instead of a raw dict dump."""
+    if not results:
+        return "No matching memories."
+    lines = []
+    used = 0
+    for i, res in enumerate(results, 1):
+        header = f"[{i}] {res.get('title') or res.get('source', 'unknown')}"
+        if res.get("distance") is not None:
+            header += f" (score {res['distance']:.2f})"
+        line = f"{header} id={res['id']}\n{truncate(res['text'], MCP_MAX_RESULT_CHARS)}"
+        if used + len(line) > MCP_MAX_OUTPUT_CHARS:
+            lines.append(f"… {len(results) - i + 1} more result(s) omitted.")
+            break
+        lines.append(line)
+        used += len(line)
+    return "\n\n".join(lines)
+
 @mcp.tool()
-def save_memory(text: str, source: str = "user") -> str:
+def save_memory(text: str, source: str = "user", namespace: str = MCP_NAMESPACE) -> str:
     """Save a note or memory to the MeshMemory brain."""
-    return add_note(text, source)
+    return add_note(text, source, namespace=namespace)
 
 @mcp.tool()
-def search_memory(query: str) -> str:
+def search_memory(query: str, limit: int = 5, namespace: str = MCP_NAMESPACE) -> str:
     """Search for memories related to the query."""
-    results = search_notes(query)
-    return str(results)
+    results = search_notes(query, limit=min(max(limit, 1), 50), namespace=namespace) # Same bounds as /search
+    return format_results(results)
 
 @mcp.tool()
-def ask_brain_tool(question: str) -> str:
-    """Ask the brain a question based on stored memories."""
-    return ask_brain(question)
+def ask_brain_tool(question: str, session_id: str = "", namespace: str = MCP_NAMESPACE) -> str:
+    """Ask the brain a question based on stored memories. Pass the returned session id to continue a conversation."""
+    response = ask_brain(question, session_id=session_id, namespace=namespace)
+    # Keep the answer's Markdown line breaks; only cap its length
+    answer = response["answer"]
+    if len(answer) > MCP_MAX_OUTPUT_CHARS:
+        answer = answer[:MCP_MAX_OUTPUT_CHARS - 1] + "…"
+    if response["sources"]:
+        answer += "\n\nSources: " + ", ".join(response["sources"])
+    return answer + f"\n(session: {response['session_id']})"
 
 if __name__ == "__main__":
     mcp.run()
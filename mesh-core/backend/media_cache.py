@@ -0,0 +1,95 @@
+import os
+import json
+import time
+import hashlib
+import re
+
+# --- Configuration ---
+MEDIA_CACHE_DIR = os.getenv("MEDIA_CACHE_DIR", os.path.join(".cache", "media"))
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def hash_file(file_path: str) -> str:
+    """SHA-256 of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def save_upload(src, dest_path: str) -> tuple:
+    """Copies an uploaded file object to disk, hashing it on the way. Returns (sha256, size)."""
+    digest = hashlib.sha256()
+    size = 0
+    with open(dest_path, "wb") as out:
+        for chunk in iter(lambda: src.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+            out.write(chunk)
+            size += len(chunk)
+    return digest.hexdigest(), size
+
+
+def _cache_path(content_hash: str, model: str) -> str:
+    return os.path.join(MEDIA_CACHE_DIR, model.replace("/", "_"), f"{content_hash}.json")
+
+
+def get_cached(content_hash: str, model: str):
+    """Returns the cached transcript/description for this content + model, or None."""
+    try:
+        with open(_cache_path(content_hash, model), encoding="utf-8") as f:
+            return json.load(f)["text"]
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def put_cached(content_hash: str, model: str, text: str, mime_type: str = ""):
+    path = _cache_path(content_hash, model)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Write then rename so a crash never leaves a half-written entry behind
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"text": text, "mime_type": mime_type, "model": model, "created": time.time()}, f)
+    os.replace(tmp_path, path)
+
+
+# --- Ingestion jobs ---
+# Job state lives on disk next to the cache, so any worker can answer a status poll
+JOBS_DIR = os.path.join(MEDIA_CACHE_DIR, "jobs")
+JOB_TTL_SECONDS = 24 * 3600
+JOB_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+
+
+def save_job(job_id: str, job: dict):
+    os.makedirs(JOBS_DIR, exist_ok=True)
+    path = os.path.join(JOBS_DIR, f"{job_id}.json")
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(job, f)
+    os.replace(tmp_path, path)
+
+
+def load_job(job_id: str):
+    """Returns the job's state, or None if it is unknown (or the id is malformed)."""
+    if not JOB_ID_PATTERN.match(job_id):
+        return None
+    try:
+        with open(os.path.join(JOBS_DIR, f"{job_id}.json"), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def prune_jobs(ttl: int = JOB_TTL_SECONDS):
+    """Deletes job records older than `ttl` seconds."""
+    cutoff = time.time() - ttl
+    try:
+        entries = list(os.scandir(JOBS_DIR))
+    except OSError:
+        return
+    for entry in entries:
+        try:
+            if entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+        except OSError:
+            pass
@@ -0,0 +1,76 @@
+"""Migrates an existing Note collection to the index settings in .env.
+
+    # Apply mutable settings (ef, quantization) in place
+    python migrate_schema.py --in-place
+
+    # Copy into a new collection created with the full current config
+    # (needed for efConstruction, maxConnections or BM25_PROPERTIES changes),
+    # then point the backend at it with WEAVIATE_COLLECTION=Note_v2
+    python migrate_schema.py --to Note_v2
+
+With MULTI_TENANCY=true the new collection is multi-tenant: notes from a plain
+collection land in --namespace (default: DEFAULT_NAMESPACE), tenants of a
+multi-tenant collection are copied one to one.
+"""
+import argparse
+from core_logic import client, CLASS_NAME, MULTI_TENANCY, DEFAULT_NAMESPACE, ensure_schema, apply_index_config, _extract_vector
+
+
+def _copy_objects(source, target) -> tuple:
+    """Copies every object (properties, vector and UUID). Returns (copied, failed)."""
+    count = 0
+    with target.batch.dynamic() as batch:
+        for obj in source.iterator(include_vector=True):
+            batch.add_object(properties=obj.properties, vector=_extract_vector(obj.vector), uuid=obj.uuid)
+            count += 1
+            if count % 1000 == 0:
+                print(f"Copied {count} objects...")
+
+    failed = target.batch.failed_objects
+    if failed:
+        print(f"!!! {len(failed)} objects failed to copy, e.g.: {failed[0].message}")
+    return count - len(failed), len(failed)
+
+
+def copy_collection(source_name: str, target_name: str, namespace: str = DEFAULT_NAMESPACE) -> int:
+    """Copies a collection into a freshly configured one, tenant by tenant when needed."""
+    if target_name in client.collections.list_all():
+        raise ValueError(f"Collection {target_name} already exists; pick a new name.")
+    source = client.collections.get(source_name)
+    source_tenants = list(source.tenants.get()) if source.config.get().multi_tenancy_config.enabled else None
+    if source_tenants is not None and not MULTI_TENANCY:
+        raise ValueError(f"{source_name} is multi-tenant; set MULTI_TENANCY=true to migrate it.")
+
+    ensure_schema(target_name)
+    target = client.collections.get(target_name)
+
+    if source_tenants is None:
+        pairs = [(source, target.with_tenant(namespace) if MULTI_TENANCY else target)]
+    else:
+        pairs = [(source.with_tenant(name), target.with_tenant(name)) for name in source_tenants]
+
+    copied = 0
+    for src, dst in pairs:
+        ok, failed = _copy_objects(src, dst)
+        print(f"Copied {ok}/{ok + failed} objects into {target_name}" + (f" ({dst.tenant})" if MULTI_TENANCY else "") + ".")
+        copied += ok
+    return copied
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--source", default=CLASS_NAME, help="Collection to migrate (default: WEAVIATE_COLLECTION)")
+    parser.add_argument("--namespace", default=DEFAULT_NAMESPACE, help="Target namespace for notes from a plain collection")
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument("--in-place", action="store_true", help="Update ef/quantization on the existing collection")
+    group.add_argument("--to", metavar="NAME", help="Copy into a new collection with the current config")
+    args = parser.parse_args()
+
+    try:
+        if args.in_place:
+            apply_index_config(args.source)
+        else:
+            copy_collection(args.source, args.to, args.namespace)
+            print(f"Done. Set WEAVIATE_COLLECTION={args.to} and restart the backend.")
+    finally:
+        client.close()
@@ -0,0 +1,107 @@
+import os
+import time
+import uuid
+import threading
+from collections import OrderedDict
+
+# --- Configuration ---
+SESSION_TTL_SECONDS = int(os.getenv("SESSION_TTL_SECONDS", 3600))
+SESSION_MAX_SESSIONS = int(os.getenv("SESSION_MAX_SESSIONS", 1000))
+# Turns kept verbatim; older ones are folded into the rolling summary
+SESSION_RECENT_TURNS = int(os.getenv("SESSION_RECENT_TURNS", 3))
+# Fold only once this many turns piled up, so the summary (and the prompt prefix that
+# contains it) changes every SESSION_RECENT_TURNS turns instead of on every turn
+SESSION_FOLD_AT_TURNS = 2 * SESSION_RECENT_TURNS
+
+
+class Session:
+    """One conversation: recent turns verbatim, everything older as a rolling summary."""
+
+    def __init__(self, session_id: str, namespace: str = ""):
+        self.id = session_id
+        self.namespace = namespace # Sessions never carry history across namespaces
+        self.turns = []            # [{"user": ..., "ai": ...}]
+        self.summary = ""
+        self.ollama_context = None # Ollama KV context from the last local answer
+        self.compressing = False
+        self.last_access = time.monotonic()
+        self.lock = threading.Lock()
+
+    def add_turn(self, user: str, ai: str):
+        with self.lock:
+            self.turns.append({"user": user, "ai": ai})
+
+    def overflow(self) -> list:
+        """Turns due for the summary: the older half, once SESSION_FOLD_AT_TURNS turns piled up."""
+        with self.lock:
+            return list(self.turns[:-SESSION_RECENT_TURNS]) if len(self.turns) >= SESSION_FOLD_AT_TURNS else []
+
+    def recent_turns(self) -> list:
+        """Turns not yet in the summary (at most SESSION_FOLD_AT_TURNS)."""
+        with self.lock:
+            return list(self.turns)
+
+    def fold(self, count: int, summary: str):
+        """Replaces the first `count` turns with the new summary."""
+        with self.lock:
+            del self.turns[:count]
+            self.summary = summary
+            # The stable prompt prefix changed, so the cached Ollama context no longer matches
+            self.ollama_context = None
+
+    def history_text(self) -> str:
+        with self.lock:
+            text = f"Summary of earlier conversation: {self.summary}\n" if self.summary else ""
+            for turn in self.turns:
+                text += f"User: {turn['user']}\nAI: {turn['ai']}\n"
+            return text
+
+
+class SessionStore:
+    """Bounded, TTL-evicted in-memory session store (LRU when full)."""
+
+    def __init__(self, ttl: int = SESSION_TTL_SECONDS, max_sessions: int = SESSION_MAX_SESSIONS):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.sessions = OrderedDict()
+        self.lock = threading.Lock()
+
+    def _evict(self):
+        now = time.monotonic()
+        while self.sessions:
+            oldest = next(iter(self.sessions.values()))
+            if now - oldest.last_access <= self.ttl and len(self.sessions) <= self.max_sessions:
+                break
+            self.sessions.popitem(last=False)
+
+    def get(self, session_id: str):
+        """Returns the session (refreshing its TTL), or None if unknown/expired."""
+        with self.lock:
+            self._evict()
+            session = self.sessions.get(session_id)
+            if session:
+                session.last_access = time.monotonic()
+                self.sessions.move_to_end(session_id)
+            return session
+
+    def create(self, history: list = None, namespace: str = "") -> Session:
+        """Starts a session, optionally seeded with (the tail of) client-side history."""
+        session = Session(uuid.uuid4().hex, namespace)
+        for turn in (history or [])[-SESSION_FOLD_AT_TURNS + 1:]:
+            session.add_turn(turn.get("user", ""), turn.get("ai", ""))
+        with self.lock:
+            self.sessions[session.id] = session
+            self._evict()
+        return session
+
+    def get_or_create(self, session_id: str = "", history: list = None, namespace: str = "") -> tuple:
+        """Returns (session, created). A missing/expired session is re-seeded from `history`.
+
+        A session from another namespace is never reused (nor its history carried over).
+        """
+        session = session_id and self.get(session_id)
+        if session and session.namespace == namespace:
+            return session, False
+        if session:
+            return self.create(namespace=namespace), True
+        return self.create(history, namespace), True
@@ -9,6 +9,7 @@ export default function ChatPage() {
   const [loading, setLoading] = useState(false);
   const [mode, setMode] = useState("local");
   const [apiKey, setApiKey] = useState("");
+  const [sessionId, setSessionId] = useState("");
   const scrollRef = useRef<HTMLDivElement>(null);
   const isReadOnly = process.env.NEXT_PUBLIC_READ_ONLY === "true";
 
@@ -36,7 +37,9 @@ export default function ChatPage() {
     setChatHistory(prev => [...prev, { user: currentQuery, ai: "Thinking...", sources: [] }]);
     
     try {
-        const res = await askBrain(currentQuery, chatHistory, mode, apiKey);
+        const res = await askBrain(currentQuery, chatHistory, mode, apiKey, sessionId);
+        if (res.session_new && sessionId) console.warn("Chat session expired; restored from recent history.");
+        if (res.session_id) setSessionId(res.session_id);
         
         setChatHistory(prev => {
             const newHistory = [...prev];
@@ -4,7 +4,7 @@ import { useState, useEffect, useRef, useCallback } from "react";
 import { useRouter } from "next/navigation";
 import dynamic from "next/dynamic";
 import { motion, AnimatePresence } from "framer-motion";
-import { checkHealth, ingestNote, getGraphData, ingestURL, ingestYouTube, ingestFile } from "@/lib/api";
+import { checkHealth, ingestNote, getGraphData, getClusterDetail, ingestURL, ingestYouTube, ingestFile } from "@/lib/api";
 import Footer from "@/components/Footer";
 
 // Dynamically import ForceGraph2D to avoid SSR issues
@@ -30,7 +30,7 @@ export default function Home() {
   const [file, setFile] = useState<File | null>(null);
   const [urlInput, setUrlInput] = useState("");
   const [activeTab, setActiveTab] = useState("note"); // note, file, web, youtube
-  const [graphData, setGraphData] = useState({ nodes: [], links: [] });
+  const [graphData, setGraphData] = useState<{ nodes: any[], links: any[] }>({ nodes: [], links: [] });
   const [toast, setToast] = useState<string | null>(null);
   const fileInputRef = useRef<HTMLInputElement>(null);
   const [graphDimensions, setGraphDimensions] = useState({ width: 0, height: 0 });
@@ -89,17 +89,44 @@ export default function Home() {
     }
   }, [toast]);
 
+  const graphThreshold = () => {
+    const savedThreshold = localStorage.getItem("graph_threshold");
+    return savedThreshold ? parseFloat(savedThreshold) : 0.7;
+  };
+
   const refreshGraph = async () => {
     try {
-        const savedThreshold = localStorage.getItem("graph_threshold");
-        const threshold = savedThreshold ? parseFloat(savedThreshold) : 0.7;
-        const data = await getGraphData(threshold);
+        const data = await getGraphData(graphThreshold());
         setGraphData(data);
     } catch (e) {
         console.error("Error refreshing graph:", e);
     }
   };
 
+  // Large collections come back as clusters: clicking one swaps it for its notes
+  const expandCluster = async (node: any) => {
+    if (!node.isCluster) return;
+    try {
+        const detail = await getClusterDetail(node.cluster, node.epoch, graphThreshold());
+        if (detail.stale) {
+            // Clusters were rebuilt since this graph was fetched, so the id means something else now
+            await refreshGraph();
+            return;
+        }
+        // ForceGraph replaces link endpoints with node objects once it has laid them out
+        const endpoint = (end: any) => typeof end === "object" ? end.id : end;
+        setGraphData(prev => ({
+            nodes: [...prev.nodes.filter(n => n.id !== node.id), ...detail.nodes],
+            links: [
+                ...prev.links.filter(l => endpoint(l.source) !== node.id && endpoint(l.target) !== node.id),
+                ...detail.links
+            ]
+        }));
+    } catch (e) {
+        console.error("Error expanding cluster:", e);
+    }
+  };
+
   const handleIngest = async () => {
     setIngesting(true);
     try {
@@ -313,6 +340,7 @@ export default function Home() {
                         height={graphDimensions.height}
                         graphData={graphData}
                         nodeLabel="name"
+                        onNodeClick={expandCluster}
                         backgroundColor="rgba(0,0,0,0)"
                         nodeRelSize={6}
                         nodeColor={(node: any) => node.source === "user" ? "#ffffff" : stringToColor(node.source || "")}
@@ -62,7 +62,18 @@ export async function ingestFile(file: File, apiKey: string = "") {
         method: "POST",
         body: formData,
     });
-    return res.json();
+    let data = await res.json();
+
+    // Long audio/video is transcribed in the background: poll until the job finishes (max ~15 min)
+    for (let polls = 0; data.status === "processing" || data.status === "queued"; polls++) {
+        if (polls >= 300) {
+            return { status: "error", job_id: data.job_id, message: "Timed out waiting for the file to be processed." };
+        }
+        await new Promise(resolve => setTimeout(resolve, 3000));
+        const job = await fetch(`${API_URL}/ingest/jobs/${data.job_id}`);
+        data = { job_id: data.job_id, ...(await job.json()) };
+    }
+    return data;
 }
 
 
@@ -91,11 +102,13 @@ export async function searchNotes(query: string) {
     return res.json();
 }
 
-export async function askBrain(query: string, history: Array<{ user: string, ai: string, sources?: string[] }> = [], mode: string = "local", apiKey: string = "") {
+export async function askBrain(query: string, history: Array<{ user: string, ai: string, sources?: string[] }> = [], mode: string = "local", apiKey: string = "", sessionId: string = "") {
+    // The backend keeps the conversation per session id. The last few turns still go along
+    // so it can re-seed the session if it expired, restarted, or lives in another worker.
     const res = await fetch(`${API_URL}/qa`, {
         method: "POST",
         headers: { "Content-Type": "application/json" },
-        body: JSON.stringify({ query, history, mode, api_key: apiKey }),
+        body: JSON.stringify({ query, history: history.slice(-5), mode, api_key: apiKey, session_id: sessionId }),
     });
     return res.json();
 }
@@ -111,6 +124,19 @@ export async function getGraphData(threshold: number = 0.6) {
     }
 }
 
+// Expands a cluster node from getGraphData. `stale: true` means the clusters were rebuilt
+// since that graph was fetched, so the caller should refetch it.
+export async function getClusterDetail(cluster: number, epoch: string, threshold: number = 0.6) {
+    try {
+        const res = await fetch(`${API_URL}/graph/cluster/${cluster}?threshold=${threshold}&epoch=${encodeURIComponent(epoch)}`);
+        if (!res.ok) throw new Error("Cluster fetch failed");
+        return res.json();
+    } catch (e) {
+        console.error("Failed to fetch cluster detail:", e);
+        return { nodes: [], links: [] };
+    }
+}
+
 export async function deleteNote(uuid: string) {
     checkAuth();
     const res = await fetch(`${API_URL}/notes/${uuid}`, {